@@ -0,0 +1,85 @@
+"""
+Parallel parsing of many Power.log files.
+"""
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from typing import (
+	Any, Callable, Iterable, Iterator, List, NamedTuple, Optional, Tuple, Type
+)
+
+from .exceptions import ParsingError
+from .export import BaseExporter, EntityTreeExporter
+from .parser import LogParser
+
+
+class BatchResult(NamedTuple):
+	path: str
+	# One collected export result per game in the file
+	results: List[Any]
+	# The exception that aborted parsing of this file, if any
+	error: Optional[BaseException] = None
+
+
+def _collect_default(result):
+	if isinstance(result, BaseExporter):
+		# Exporters returning themselves still reference the full PacketTree
+		result.packet_tree = None
+		result.dispatch = None
+	return result
+
+
+def parse_path(
+	path: str,
+	exporter_class: Type[BaseExporter],
+	collect: Optional[Callable[[Any], Any]] = None,
+	catch: Tuple[Type[BaseException], ...] = (ParsingError,),
+) -> BatchResult:
+	"""
+	Parse the Power.log at `path` and export each of its games with
+	`exporter_class`. See `parse_many()`.
+	"""
+	if collect is None:
+		collect = _collect_default
+
+	parser = LogParser()
+	try:
+		parser.read_path(path)
+		parser.flush()
+
+		results = []
+		for packet_tree in parser.games:
+			if issubclass(exporter_class, EntityTreeExporter):
+				exporter = exporter_class(packet_tree, player_manager=parser.player_manager)
+			else:
+				exporter = exporter_class(packet_tree)
+			results.append(collect(exporter.export()))
+	except catch as e:
+		return BatchResult(path, [], e)
+
+	return BatchResult(path, results)
+
+
+def parse_many(
+	paths: Iterable[str],
+	exporter_class: Type[BaseExporter],
+	workers: Optional[int] = None,
+	collect: Optional[Callable[[Any], Any]] = None,
+	catch: Tuple[Type[BaseException], ...] = (ParsingError,),
+) -> Iterator[BatchResult]:
+	"""
+	Parse and export the Power.log files at `paths` in a pool of `workers`
+	processes (default: one per CPU). Yields a BatchResult per path, in order.
+
+	Only the exported results are sent back from the workers: the value
+	returned by `export()` is passed through `collect` (which, like
+	`exporter_class`, must be picklable, e.g. a module-level function).
+	By default, exporters returning themselves are sent back without their
+	PacketTree.
+
+	Exceptions of the `catch` types (by default ParsingError, which includes
+	CorruptLogError) are stored in the file's BatchResult; any other exception
+	is raised when its result is reached.
+	"""
+	worker = partial(parse_path, exporter_class=exporter_class, collect=collect, catch=catch)
+	with ProcessPoolExecutor(max_workers=workers) as executor:
+		yield from executor.map(worker, paths)
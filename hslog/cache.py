@@ -0,0 +1,220 @@
+"""
+On-disk cache of parse results, keyed by the content of the parsed log.
+
+	cache = ParseCache("/var/cache/hslog", max_size=2 * 1024 ** 3)
+	parser = LogParser()
+	cache.read_path(parser, "Power.log")
+	parser.games  # Parsed or loaded from the cache
+
+Entries are pickled: only use cache directories that no one else can
+write to, as loading a crafted entry can run arbitrary code.
+"""
+import hashlib
+import os
+import pickle
+import tempfile
+from datetime import datetime
+from io import BytesIO, StringIO
+from typing import Any, NamedTuple, Optional
+
+from .parser import LogParser, ParsingState
+
+
+try:
+	from importlib.metadata import PackageNotFoundError, version
+except ImportError:
+	from pkg_resources import DistributionNotFound as PackageNotFoundError
+	from pkg_resources import get_distribution
+
+	def version(name):
+		return get_distribution(name).version
+
+
+DEFAULT_MAX_SIZE = 1024 ** 3
+ENTRY_SUFFIX = ".hslog-cache"
+# Version of the format of the entries, part of the cache keys
+CACHE_FORMAT_VERSION = 2
+
+
+def _package_version(name: str) -> str:
+	try:
+		return version(name)
+	except PackageNotFoundError:
+		return "unknown"
+
+
+class CacheEntry(NamedTuple):
+	# The state of the parser after reading the log, with its games, game
+	# meta and player manager
+	parsing_state: ParsingState
+	current_date: Optional[datetime]
+	last_ts: Any
+	synced_timestamp: bool
+
+
+class ParseCache:
+	def __init__(self, directory: str, max_size: int = DEFAULT_MAX_SIZE):
+		"""
+		Cache parse results in `directory`, evicting the least recently used
+		entries once their total size exceeds `max_size` bytes.
+
+		Entries are stored with pickle, so `directory` must be trusted: anyone
+		able to write to it can run code in the processes using the cache.
+		"""
+		self.directory = directory
+		self.max_size = max_size
+		self.hits = 0
+		self.misses = 0
+		os.makedirs(directory, exist_ok=True)
+
+	def key(self, parser: LogParser, data: bytes) -> str:
+		"""
+		Return the cache key for parsing \a data with \a parser.
+
+		Besides the log content, the key covers the hslog and hearthstone
+		versions and the parser settings affecting the result, so that
+		upgrades and differently configured parsers never see stale entries.
+		"""
+		h = hashlib.sha256()
+		h.update(data)
+		h.update(repr((
+			_package_version("hslog"),
+			_package_version("hearthstone"),
+			CACHE_FORMAT_VERSION,
+			parser._parsing_state.columnar,
+			parser._parsing_state.index,
+			parser._current_date,
+			[type(handler).__qualname__ for handler in parser._handlers],
+		)).encode("utf-8"))
+		return h.hexdigest()
+
+	def _path(self, key: str) -> str:
+		return os.path.join(self.directory, key + ENTRY_SUFFIX)
+
+	def get(self, key: str) -> Optional[CacheEntry]:
+		path = self._path(key)
+		try:
+			with open(path, "rb") as f:
+				entry = pickle.load(f)
+		except FileNotFoundError:
+			return None
+		except Exception:
+			# Truncated or otherwise unreadable entry: drop it and reparse
+			self._remove(path)
+			return None
+
+		# Mark the entry as recently used
+		try:
+			os.utime(path)
+		except OSError:
+			pass
+		return CacheEntry(*entry)
+
+	def put(self, key: str, parser: LogParser):
+		data = pickle.dumps((
+			parser._parsing_state,
+			parser._current_date,
+			parser._last_ts,
+			parser._synced_timestamp,
+		), pickle.HIGHEST_PROTOCOL)
+
+		# Write atomically, so that concurrent readers never see partial entries
+		fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+		try:
+			with os.fdopen(fd, "wb") as f:
+				f.write(data)
+			os.replace(tmp_path, self._path(key))
+		except BaseException:
+			self._remove(tmp_path)
+			raise
+
+		self.evict()
+
+	def evict(self):
+		"""
+		Remove the least recently used entries until the total size of the
+		cache is at most `max_size`.
+		"""
+		entries = []
+		total = 0
+		with os.scandir(self.directory) as it:
+			for dirent in it:
+				if not dirent.name.endswith(ENTRY_SUFFIX):
+					continue
+				try:
+					stat = dirent.stat()
+				except FileNotFoundError:
+					continue
+				entries.append((stat.st_mtime, stat.st_size, dirent.path))
+				total += stat.st_size
+
+		entries.sort()
+		for _, size, path in entries:
+			if total <= self.max_size:
+				break
+			self._remove(path)
+			total -= size
+
+	def clear(self):
+		with os.scandir(self.directory) as it:
+			for dirent in it:
+				if dirent.name.endswith(ENTRY_SUFFIX):
+					self._remove(dirent.path)
+
+	@staticmethod
+	def _remove(path: str):
+		try:
+			os.remove(path)
+		except FileNotFoundError:
+			pass
+
+	def read(self, parser: LogParser, fp):
+		"""
+		Read the log in the (text or binary) file object `fp` into `parser`,
+		going through the cache. See `read_data()`.
+		"""
+		self.read_data(parser, fp.read())
+
+	def read_path(self, parser: LogParser, path: str):
+		with open(path, "rb") as f:
+			self.read_data(parser, f.read())
+
+	def read_data(self, parser: LogParser, data):
+		"""
+		Read the log `data` (str or bytes) into `parser`, then flush it.
+
+		On a cache hit, the parsing state of `parser` (its games, game meta,
+		player manager and the game and blocks still open) is replaced with
+		the cached one without parsing. Only fresh parsers (which have not
+		read anything yet) use the cache; others just parse. So do parsers with
+		subscribers or a packet sink, as a cache hit emits no events.
+		"""
+		state = parser._parsing_state
+		if (
+			state.games or state.packet_tree is not None or
+			state.subscribers or state.packet_sink is not None
+		):
+			self._parse(parser, data)
+			return
+
+		key = self.key(parser, data.encode("utf-8") if isinstance(data, str) else data)
+		entry = self.get(key)
+		if entry is not None:
+			self.hits += 1
+			parser._parsing_state = entry.parsing_state
+			parser._current_date = entry.current_date
+			parser._last_ts = entry.last_ts
+			parser._synced_timestamp = entry.synced_timestamp
+			return
+
+		self.misses += 1
+		self._parse(parser, data)
+		self.put(key, parser)
+
+	@staticmethod
+	def _parse(parser: LogParser, data):
+		if isinstance(data, str):
+			parser.read(StringIO(data))
+		else:
+			parser.read_bytes(BytesIO(data))
+		parser.flush()
@@ -0,0 +1,512 @@
+"""
+Compact, versioned binary serialization of PacketTree objects.
+
+The format is a stream of tagged values. Strings, enum members and
+PlayerReference objects are written once and referenced by index
+afterwards; integers are varints and timestamps are encoded as the
+difference to the previous timestamp.
+
+Only the types that occur in PacketTree objects can be serialized: enum
+members must come from one of the `ENUM_MODULES`, and time zones are
+stored as their UTC offset. Invalid data raises a CodecError.
+
+	data = dumps(packet_tree)
+	packet_tree = loads(data)
+"""
+from datetime import date, datetime, time, timedelta, timezone
+from enum import IntEnum
+from importlib import import_module
+from typing import BinaryIO
+
+from . import packets
+from .exceptions import CodecError
+from .player import PlayerReference
+
+
+MAGIC = b"HSPT"
+CODEC_VERSION = 2
+
+# Modules enum classes may be imported from when decoding
+ENUM_MODULES = ("hearthstone.enums", )
+
+# Packet classes by code. Append only: codes are part of the format.
+PACKET_CLASSES = (
+	packets.CreateGame,
+	packets.CreateGame.Player,
+	packets.Block,
+	packets.MetaData,
+	packets.HideEntity,
+	packets.FullEntity,
+	packets.ShowEntity,
+	packets.ChangeEntity,
+	packets.TagChange,
+	packets.Choices,
+	packets.SendChoices,
+	packets.ChosenEntities,
+	packets.Options,
+	packets.Option,
+	packets.SendOption,
+	packets.ResetGame,
+	packets.SubSpell,
+	packets.CachedTagForDormantChange,
+	packets.VOSpell,
+	packets.ShuffleDeck,
+)
+
+# Value tags. Tags from SMALL_INT up encode the integers 0-127 directly.
+NONE = 0
+FALSE = 1
+TRUE = 2
+INT = 3
+STR = 4
+STR_REF = 5
+ENUM = 6
+ENUM_REF = 7
+LIST = 8
+TUPLE = 9
+TIME = 10
+DATETIME = 11
+SAME_TS = 12
+PACKET = 13
+MISSING = 14
+PLAYER = 15
+PLAYER_REF = 16
+TZ = 17
+TZ_REF = 18
+SMALL_INT = 128
+
+_MICROSECONDS_PER_DAY = 86400 * 1000000
+_BLOCK_CLASSES = (packets.Block, packets.SubSpell)
+
+
+def _packet_fields(cls):
+	"""
+	Return the attributes of packet class \a cls that are serialized as
+	tagged values: all of its slots except for `ts` and `packet_id`, which
+	are always written first, and `parent`, which is restored from the nesting.
+	"""
+	fields = []
+	for klass in reversed(cls.__mro__):
+		for name in klass.__dict__.get("__slots__", ()):
+			if name not in ("ts", "packet_id", "parent") and name not in fields:
+				fields.append(name)
+	return tuple(fields)
+
+
+_FIELDS = tuple(_packet_fields(cls) for cls in PACKET_CLASSES)
+_CLASS_CODES = {cls: code for code, cls in enumerate(PACKET_CLASSES)}
+
+
+def _varint(value: int) -> bytes:
+	ret = bytearray()
+	while value > 0x7f:
+		ret.append((value & 0x7f) | 0x80)
+		value >>= 7
+	ret.append(value)
+	return bytes(ret)
+
+
+def _zigzag(value: int) -> int:
+	return value << 1 if value >= 0 else (-value << 1) - 1
+
+
+def _unzigzag(value: int) -> int:
+	return value >> 1 if not value & 1 else -((value + 1) >> 1)
+
+
+def _time_to_us(ts: time) -> int:
+	return ((ts.hour * 60 + ts.minute) * 60 + ts.second) * 1000000 + ts.microsecond
+
+
+def _us_to_time(us: int) -> time:
+	seconds, microsecond = divmod(us, 1000000)
+	minutes, second = divmod(seconds, 60)
+	hour, minute = divmod(minutes, 60)
+	return time(hour, minute, second, microsecond)
+
+
+class Encoder:
+	def __init__(self):
+		self.buf = bytearray(MAGIC + _varint(CODEC_VERSION))
+		# Encoded bytes of every scalar value (by type) written so far. Strings
+		# and enum members are written out once, then referenced by index.
+		self._memo = {
+			int: {},
+			str: {},
+			bool: {False: bytes((FALSE, )), True: bytes((TRUE, ))},
+			type(None): {None: bytes((NONE, ))},
+		}
+		self._string_count = 0
+		self._member_count = 0
+		self._players = {}
+		self._timezones = {}
+		self._last_ts = None
+		self._last_us = 0
+		self._last_packet_id = 0
+
+	def _write_scalar(self, t, value, memo):
+		buf = self.buf
+		if t is int:
+			if 0 <= value < 128:
+				encoded = bytes((SMALL_INT | value, ))
+			else:
+				encoded = bytes((INT, )) + _varint(_zigzag(value))
+			buf += encoded
+		elif t is str:
+			data = value.encode("utf-8", "surrogatepass")
+			buf.append(STR)
+			buf += _varint(len(data))
+			buf += data
+			encoded = bytes((STR_REF, )) + _varint(self._string_count)
+			self._string_count += 1
+		else:
+			if t.__module__ not in ENUM_MODULES:
+				raise CodecError("Cannot serialize %r: not in ENUM_MODULES" % (value, ))
+			buf.append(ENUM)
+			self.write("%s:%s" % (t.__module__, t.__qualname__))
+			buf += _varint(_zigzag(int(value)))
+			encoded = bytes((ENUM_REF, )) + _varint(self._member_count)
+			self._member_count += 1
+		memo[value] = encoded
+
+	def _write_ts(self, value):
+		buf = self.buf
+		if type(value) is time:
+			us = _time_to_us(value)
+			buf.append(TIME)
+		else:
+			us = value.toordinal() * _MICROSECONDS_PER_DAY + _time_to_us(value.time())
+			buf.append(DATETIME)
+		self._write_tz(value)
+		buf += _varint(_zigzag(us - self._last_us))
+		self._last_ts = value
+		self._last_us = us
+
+	def _write_player(self, value: PlayerReference):
+		index = self._players.get(id(value))
+		if index is None:
+			self._players[id(value)] = len(self._players)
+			self.buf.append(PLAYER)
+			self.write(value.entity_id)
+			self.write(value.name)
+			self.write(value.player_id)
+		else:
+			self.buf.append(PLAYER_REF)
+			self.buf += _varint(index)
+
+	def _write_packet(self, value: packets.Packet, code: int):
+		buf = self.buf
+		write = self.write
+		buf.append(PACKET)
+		buf.append(code)
+
+		ts = value.ts
+		if ts is self._last_ts:
+			buf.append(SAME_TS)
+		else:
+			write(ts)
+
+		# Packet ids are mostly sequential: write the delta to the previous one
+		packet_id = getattr(value, "packet_id", None)
+		if packet_id is None:
+			buf.append(0)
+		else:
+			buf += _varint(_zigzag(packet_id - self._last_packet_id) + 1)
+			self._last_packet_id = packet_id
+
+		for name in _FIELDS[code]:
+			try:
+				field = getattr(value, name)
+			except AttributeError:
+				buf.append(MISSING)
+			else:
+				write(field)
+
+	def _write_sequence(self, tag: int, value):
+		self.buf.append(tag)
+		self.buf += _varint(len(value))
+		write = self.write
+		for item in value:
+			write(item)
+
+	def _write_tz(self, value):
+		"""Write the time zone of timestamp \a value as its UTC offset."""
+		tzinfo = value.tzinfo
+		if tzinfo is None:
+			self.buf.append(NONE)
+			return
+		index = self._timezones.get(id(tzinfo))
+		if index is None:
+			offset = value.utcoffset()
+			if offset is None:
+				raise CodecError("Cannot serialize time zone %r" % (tzinfo, ))
+			# Keep tzinfo alive, so that its id() isn't reused
+			self._timezones[id(tzinfo)] = (len(self._timezones), tzinfo)
+			self.buf.append(TZ)
+			self.buf += _varint(_zigzag(offset // timedelta(microseconds=1)))
+		else:
+			self.buf.append(TZ_REF)
+			self.buf += _varint(index[0])
+
+	def write(self, value):
+		t = type(value)
+		memo = self._memo.get(t)
+		if memo is not None:
+			try:
+				self.buf += memo[value]
+			except KeyError:
+				self._write_scalar(t, value, memo)
+		elif t in _CLASS_CODES:
+			self._write_packet(value, _CLASS_CODES[t])
+		elif t is list or t is packets.PacketList:
+			self._write_sequence(LIST, value)
+		elif t is tuple:
+			self._write_sequence(TUPLE, value)
+		elif t is time or t is datetime:
+			if value is self._last_ts:
+				self.buf.append(SAME_TS)
+			else:
+				self._write_ts(value)
+		elif t is PlayerReference:
+			self._write_player(value)
+		elif isinstance(value, IntEnum):
+			self._memo[t] = {}
+			self.write(value)
+		else:
+			raise CodecError("Cannot serialize %r" % (value, ))
+
+	def encode(self, packet_tree: packets.PacketTree) -> bytes:
+		self.write(packet_tree.ts)
+		self.write(packet_tree.packet_counter)
+		self.write(packet_tree.spectator_mode)
+		self.write(packet_tree.columnar)
+		self.write(packet_tree.packets)
+		return bytes(self.buf)
+
+
+class Decoder:
+	def __init__(self, data: bytes):
+		self.data = data if isinstance(data, bytes) else bytes(data)
+		self.pos = 0
+		self._strings = []
+		self._members = []
+		self._enum_classes = {}
+		self._players = []
+		self._timezones = []
+		self._last_ts = None
+		self._last_us = 0
+		self._last_packet_id = 0
+
+		readers = [self._invalid] * 256
+		readers[NONE] = lambda: None
+		readers[FALSE] = lambda: False
+		readers[TRUE] = lambda: True
+		readers[INT] = lambda: _unzigzag(self.read_varint())
+		readers[STR] = self._read_str
+		readers[STR_REF] = lambda: self._strings[self.read_varint()]
+		readers[ENUM] = self._read_enum
+		readers[ENUM_REF] = lambda: self._members[self.read_varint()]
+		readers[LIST] = self._read_list
+		readers[TUPLE] = lambda: tuple(self._read_list())
+		readers[TIME] = self._read_time
+		readers[DATETIME] = self._read_datetime
+		readers[SAME_TS] = lambda: self._last_ts
+		readers[PACKET] = self._read_packet
+		readers[PLAYER] = self._read_player
+		readers[PLAYER_REF] = lambda: self._players[self.read_varint()]
+		readers[TZ] = self._read_tz
+		readers[TZ_REF] = lambda: self._timezones[self.read_varint()]
+		for i in range(SMALL_INT, 256):
+			readers[i] = (lambda value: lambda: value)(i - SMALL_INT)
+		self._readers = readers
+
+	def _invalid(self):
+		raise CodecError("Invalid value tag %r at offset %i" % (
+			self.data[self.pos - 1], self.pos - 1
+		))
+
+	def read_varint(self) -> int:
+		data = self.data
+		pos = self.pos
+		byte = data[pos]
+		self.pos = pos = pos + 1
+		if byte < 0x80:
+			return byte
+		result = byte & 0x7f
+		shift = 7
+		while byte & 0x80:
+			byte = data[pos]
+			pos += 1
+			result |= (byte & 0x7f) << shift
+			shift += 7
+		self.pos = pos
+		return result
+
+	def read(self):
+		tag = self.data[self.pos]
+		self.pos += 1
+		return self._readers[tag]()
+
+	def _read_bytes(self) -> bytes:
+		length = self.read_varint()
+		start = self.pos
+		self.pos += length
+		if self.pos > len(self.data):
+			raise IndexError(self.pos)
+		return self.data[start:self.pos]
+
+	def _read_str(self) -> str:
+		value = self._read_bytes().decode("utf-8", "surrogatepass")
+		self._strings.append(value)
+		return value
+
+	def _read_enum(self):
+		name = self.read()
+		cls = self._enum_classes.get(name)
+		if cls is None:
+			module, _, qualname = name.partition(":")
+			if module not in ENUM_MODULES:
+				raise CodecError("Enum class %r is not in ENUM_MODULES" % name)
+			cls = import_module(module)
+			for attr in qualname.split("."):
+				cls = getattr(cls, attr)
+			if not isinstance(cls, type) or not issubclass(cls, IntEnum):
+				raise CodecError("%r is not an enum class" % name)
+			self._enum_classes[name] = cls
+		value = cls(_unzigzag(self.read_varint()))
+		self._members.append(value)
+		return value
+
+	def _read_list(self) -> list:
+		read = self.read
+		return [read() for _ in range(self.read_varint())]
+
+	def _read_time(self) -> time:
+		tzinfo = self.read()
+		self._last_us += _unzigzag(self.read_varint())
+		value = _us_to_time(self._last_us)
+		if tzinfo is not None:
+			value = value.replace(tzinfo=tzinfo)
+		self._last_ts = value
+		return value
+
+	def _read_datetime(self) -> datetime:
+		tzinfo = self.read()
+		self._last_us += _unzigzag(self.read_varint())
+		days, us = divmod(self._last_us, _MICROSECONDS_PER_DAY)
+		value = datetime.combine(date.fromordinal(days), _us_to_time(us), tzinfo)
+		self._last_ts = value
+		return value
+
+	def _read_player(self) -> PlayerReference:
+		player = PlayerReference()
+		self._players.append(player)
+		player.entity_id = self.read()
+		player.name = self.read()
+		player.player_id = self.read()
+		return player
+
+	def _read_tz(self) -> timezone:
+		value = timezone(timedelta(microseconds=_unzigzag(self.read_varint())))
+		self._timezones.append(value)
+		return value
+
+	def _read_packet(self) -> packets.Packet:
+		data = self.data
+		code = data[self.pos]
+		self.pos += 1
+		try:
+			cls = PACKET_CLASSES[code]
+		except IndexError:
+			raise CodecError("Unknown packet class code %r" % code)
+
+		packet = cls.__new__(cls)
+		packet.ts = self.read()
+		packet_id = self.read_varint()
+		if packet_id:
+			self._last_packet_id += _unzigzag(packet_id - 1)
+			packet.packet_id = self._last_packet_id
+
+		readers = self._readers
+		members = self._members
+		for name in _FIELDS[code]:
+			tag = data[self.pos]
+			self.pos += 1
+			if tag >= SMALL_INT:
+				setattr(packet, name, tag - SMALL_INT)
+			elif tag == ENUM_REF:
+				setattr(packet, name, members[self.read_varint()])
+			elif tag != MISSING:
+				setattr(packet, name, readers[tag]())
+
+		if cls in _BLOCK_CLASSES:
+			packet.parent = None
+			for child in packet.packets:
+				if type(child) in _BLOCK_CLASSES:
+					child.parent = packet
+		return packet
+
+	def decode(self) -> packets.PacketTree:
+		if self.data[:len(MAGIC)] != MAGIC:
+			raise CodecError("Not a serialized PacketTree")
+		self.pos = len(MAGIC)
+
+		try:
+			return self._decode()
+		except CodecError:
+			raise
+		except IndexError:
+			raise CodecError("Truncated data")
+		except Exception as e:
+			# Corrupt data can fail in many ways, e.g. with an out of range
+			# enum value or timestamp, or a packet where a list is expected
+			raise CodecError("Invalid data at offset %i: %r" % (self.pos, e)) from e
+
+	def _decode(self) -> packets.PacketTree:
+		version = self.read_varint()
+		if version != CODEC_VERSION:
+			raise CodecError("Unsupported codec version %r" % version)
+		ts = self.read()
+		packet_counter = self.read()
+		spectator_mode = self.read()
+		columnar = self.read()
+		packet_list = self.read()
+
+		packet_tree = packets.PacketTree(ts, columnar=columnar)
+		packet_tree.packet_counter = packet_counter
+		packet_tree.spectator_mode = spectator_mode
+		for packet in packet_list:
+			if type(packet) in _BLOCK_CLASSES:
+				packet.parent = packet_tree
+
+		if columnar:
+			packet_tree.packets = self._to_packet_list(packet_tree, packet_list)
+		else:
+			packet_tree.packets = packet_list
+		return packet_tree
+
+	def _to_packet_list(self, packet_tree: packets.PacketTree, packet_list: list):
+		ret = packet_tree.packet_list()
+		for packet in packet_list:
+			if type(packet) in _BLOCK_CLASSES:
+				packet.packets = self._to_packet_list(packet_tree, packet.packets)
+			ret.append(packet)
+		return ret
+
+
+def dumps(packet_tree: packets.PacketTree) -> bytes:
+	"""Serialize \a packet_tree to bytes."""
+	return Encoder().encode(packet_tree)
+
+
+def loads(data: bytes) -> packets.PacketTree:
+	"""Deserialize a PacketTree serialized by `dumps()`."""
+	return Decoder(data).decode()
+
+
+def dump(packet_tree: packets.PacketTree, fp: BinaryIO):
+	fp.write(dumps(packet_tree))
+
+
+def load(fp: BinaryIO) -> packets.PacketTree:
+	return loads(fp.read())
@@ -0,0 +1,50 @@
+"""
+Events emitted by the LogParser while it parses, see `LogParser.subscribe()`.
+"""
+from enum import IntEnum
+from typing import Any, NamedTuple
+
+from . import packets
+
+
+class EventType(IntEnum):
+	# A packet was added to the packet tree
+	PACKET = 1
+	# A packet emitted as not final will no longer be modified
+	PACKET_FINAL = 2
+	# A Block or SubSpell was opened / closed
+	BLOCK_START = 3
+	BLOCK_END = 4
+	# A PacketTree was created / is complete
+	GAME_START = 5
+	GAME_END = 6
+	# A PlayerReference got its name, entity id and player id
+	PLAYER_RESOLVED = 7
+
+
+class Event(NamedTuple):
+	type: EventType
+	ts: Any
+	# The Packet, PacketTree (GAME_*) or PlayerReference (PLAYER_RESOLVED)
+	data: Any
+	# Whether the parser will still modify `data`
+	final: bool
+
+
+# Packets that are filled in by the lines following them. They are final once
+# the parser moves on (ParsingState.flush()), blocks once they are closed.
+OPEN_PACKET_TYPES = (
+	packets.CreateGame,
+	packets.CreateGame.Player,
+	packets.FullEntity,
+	packets.ShowEntity,
+	packets.ChangeEntity,
+	packets.MetaData,
+	packets.Choices,
+	packets.SendChoices,
+	packets.ChosenEntities,
+	packets.Options,
+	packets.Option,
+)
+
+BLOCK_TYPES = (packets.Block, packets.SubSpell)
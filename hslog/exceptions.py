@@ -30,6 +30,14 @@ class NoSuchEnum(ParsingError):
 		self.enum = enum
 		self.value = value
 
+	def __reduce__(self):
+		return self.__class__, (self.enum, self.value)
+
+
+class CodecError(Exception):
+	"""Raised when serialized PacketTree data is invalid or unsupported."""
+	pass
+
 
 class ExporterError(Exception):
 	"""Generic exception that happens during PacketTree export."""
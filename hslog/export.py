@@ -1,4 +1,6 @@
-from typing import Dict, Optional, cast
+from array import array
+from bisect import bisect_right
+from typing import Callable, Dict, Iterator, List, Optional, Tuple, cast
 
 from hearthstone.entities import Card, Game, Player
 from hearthstone.enums import BlockType, GameTag, Zone
@@ -6,12 +8,18 @@ from hearthstone.enums import BlockType, GameTag, Zone
 from . import packets
 from .exceptions import ExporterError, MissingPlayerData
 from .player import PlayerManager, coerce_to_entity_id
+from .snapshot import GameSnapshot, restore_snapshot, take_snapshot
 
 
 class BaseExporter:
 	def __init__(self, packet_tree):
 		self.packet_tree = packet_tree
 		self.dispatch = self.get_dispatch_dict()
+		# Packet class -> (handler or None, whether to export the nested packets)
+		self._handlers: Dict[type, Tuple[Optional[Callable], bool]] = {}
+		self.stopped = False
+		self._stop_before: Optional[Callable[[packets.Packet], bool]] = None
+		self._stop_after: Optional[Callable[[packets.Packet], bool]] = None
 
 	def get_dispatch_dict(self):
 		return {
@@ -37,18 +45,132 @@ class BaseExporter:
 			packets.ShuffleDeck: self.handle_shuffle_deck
 		}
 
-	def export(self) -> "BaseExporter":
+	def export(
+		self,
+		until_packet_id: Optional[int] = None,
+		until_turn: Optional[int] = None,
+		until: Optional[Callable[[packets.Packet], bool]] = None,
+	) -> "BaseExporter":
+		"""
+		Export the packets of the tree, then flush the exporter.
+		The export can be stopped early, see `set_stop_condition()`.
+		"""
+		self.set_stop_condition(until_packet_id, until_turn, until)
 		for packet in self.packet_tree:
 			self.export_packet(packet)
+			if self.stopped:
+				break
 		self.flush()
 		return self
 
+	def set_stop_condition(
+		self,
+		until_packet_id: Optional[int] = None,
+		until_turn: Optional[int] = None,
+		until: Optional[Callable[[packets.Packet], bool]] = None,
+	):
+		"""
+		Make `export_packet()` stop, including within nested blocks:
+		- before the first packet with an id above \a until_packet_id,
+		- before the TURN tag of the game entity changes to a value above
+		\a until_turn,
+		- after the first packet for which \a until(packet) is true (before
+		the packets nested in it).
+		Once stopped, `stopped` is set and no other packet is exported.
+		"""
+		self.stopped = False
+		checks = []
+		if until_packet_id is not None:
+			checks.append(
+				lambda packet: getattr(packet, "packet_id", until_packet_id) > until_packet_id
+			)
+		if until_turn is not None:
+			checks.append(_TurnCheck(until_turn))
+		if len(checks) > 1:
+			self._stop_before = lambda packet: any(check(packet) for check in checks)
+		else:
+			self._stop_before = checks[0] if checks else None
+		self._stop_after = until
+
 	def export_packet(self, packet: packets.Packet):
-		packet_type = packet.__class__
-		handler = self.dispatch.get(packet_type, None)
-		if not handler:
+		"""
+		Export \a packet and the packets nested in it.
+
+		Blocks and SubSpells which are handled by the default `handle_block()`
+		and `handle_sub_spell()` are walked with an explicit stack rather than
+		through recursive calls. If `export_packet()` is overridden, nested
+		packets are passed to it as well.
+		"""
+		if self.stopped:
+			return
+		handlers = self._handlers
+		stop_before, stop_after = self._stop_before, self._stop_after
+		stopping = stop_before is not None or stop_after is not None
+		export_nested = None
+		if type(self).export_packet is not BaseExporter.export_packet:
+			export_nested = self.export_packet
+		stack: List[Iterator[packets.Packet]] = []
+		nested = None
+
+		while True:
+			if stop_before is not None and stop_before(packet):
+				self.stopped = True
+				return
+			try:
+				handler, descend = handlers[packet.__class__]
+			except KeyError:
+				handler, descend = self._resolve_handler(packet.__class__)
+			if handler is not None:
+				handler(packet)
+			if stopping and (self.stopped or (stop_after is not None and stop_after(packet))):
+				self.stopped = True
+				return
+			if descend and packet.packets:
+				if export_nested is not None:
+					for p in packet.packets:
+						export_nested(p)
+						if self.stopped:
+							return
+				else:
+					if nested is not None:
+						stack.append(nested)
+					nested = iter(packet.packets)
+
+			packet = None
+			while nested is not None:
+				packet = next(nested, None)
+				if packet is not None:
+					break
+				nested = stack.pop() if stack else None
+			if packet is None:
+				return
+
+	def _resolve_handler(self, packet_type: type) -> Tuple[Optional[Callable], bool]:
+		"""
+		Look up the handler of \a packet_type, or of its closest base class,
+		in `dispatch`. Handlers which are BaseExporter no-ops are returned as
+		None; default block handlers are replaced by `handle_block_start()`
+		and the nested packets are exported by `export_packet()` itself.
+		"""
+		for cls in packet_type.__mro__:
+			handler = self.dispatch.get(cls)
+			if handler is not None:
+				break
+		else:
 			raise NotImplementedError("Don't know how to export %r" % packet_type)
-		handler(packet)
+
+		func = getattr(handler, "__func__", None)
+		descend = False
+		if func is BaseExporter.handle_block:
+			handler, descend = self.handle_block_start, True
+			func = handler.__func__
+		elif func is BaseExporter.handle_sub_spell:
+			handler, descend = None, True
+		if func in _NO_OP_HANDLERS:
+			handler = None
+
+		self._handlers[packet_type] = handler, descend
+		return handler, descend
 
 	def flush(self):
 		"""Finalize the export and allow any intermediate state to be cleaned up."""
@@ -61,9 +183,14 @@ class BaseExporter:
 		pass
 
 	def handle_block(self, packet: packets.Block):
+		self.handle_block_start(packet)
 		for p in packet.packets:
 			self.export_packet(p)
 
+	def handle_block_start(self, packet: packets.Block):
+		"""Called for each Block, before its packets are exported."""
+		pass
+
 	def handle_full_entity(self, packet: packets.FullEntity):
 		pass
 
@@ -119,6 +246,29 @@ class BaseExporter:
 		pass
 
 
+class _TurnCheck:
+	"""Stop condition: the game entity's TURN tag changes to a value above `turn`."""
+	def __init__(self, turn: int):
+		self.turn = turn
+		self.game_entity = None
+
+	def __call__(self, packet: packets.Packet) -> bool:
+		if isinstance(packet, packets.TagChange):
+			return (
+				packet.tag == GameTag.TURN and packet.value > self.turn and
+				packet.entity == self.game_entity
+			)
+		if isinstance(packet, packets.CreateGame):
+			self.game_entity = packet.entity
+		return False
+
+
+_NO_OP_HANDLERS = frozenset(
+	func for name, func in vars(BaseExporter).items()
+	if name.startswith("handle_") and name not in ("handle_block", "handle_sub_spell")
+)
+
+
 class CompositeExporter(BaseExporter):
 	"""Exporter implementation that broadcasts packets to configured child exporters
 
@@ -127,6 +277,10 @@ class CompositeExporter(BaseExporter):
 
 	- Packet trees passed to constructors of child exporters will be ignored; only the
 	packets in the packet tree passed to this class's constructor will be visited.
+	- `export_packet()` only calls the handlers which child exporters override for each
+	packet type. Blocks and SubSpells are walked once for all the children which use the
+	default `handle_block` and `handle_sub_spell`; children which override them, or which
+	override `export_packet`, are given the whole block and walk it themselves.
 	- Unlike BaseExporter, the `handle_block` and `handle_sub_spell` methods on this class
 	do not recursively invoke the `handle_packet` on child packets; child exporters used in
 	an instance of CompositeExporter *should* continue to recursively invoke `handle_packet`
@@ -136,6 +290,85 @@ class CompositeExporter(BaseExporter):
 	def __init__(self, packet_tree, exporters):
 		super().__init__(packet_tree)
 		self.exporters = exporters
+		# Child exporters -> packet class -> (handlers, table of the nested packets)
+		self._fan_out: Dict[tuple, Dict[type, Tuple[List[Callable], Optional[dict]]]] = {}
+
+	def export_packet(self, packet: packets.Packet):
+		if self.stopped:
+			return
+		exporters = tuple(self.exporters)
+		table = self._fan_out.setdefault(exporters, {})
+		stop_before, stop_after = self._stop_before, self._stop_after
+		stack: List[tuple] = []
+		nested = None
+
+		while True:
+			if stop_before is not None and stop_before(packet):
+				self.stopped = True
+				return
+			try:
+				handlers, nested_table = table[packet.__class__]
+			except KeyError:
+				handlers, nested_table = self._resolve_fan_out(exporters, packet.__class__)
+			for handler in handlers:
+				handler(packet)
+			if stop_after is not None and stop_after(packet):
+				self.stopped = True
+				return
+			if nested_table is not None and packet.packets:
+				if nested is not None:
+					stack.append((nested, exporters, table))
+				nested = iter(packet.packets)
+				exporters, table = nested_table
+
+			packet = None
+			while nested is not None:
+				packet = next(nested, None)
+				if packet is not None:
+					break
+				if stack:
+					nested, exporters, table = stack.pop()
+				else:
+					nested = None
+			if packet is None:
+				return
+
+	def _resolve_fan_out(self, exporters: tuple, packet_type: type):
+		"""
+		Return the handlers of \a exporters for \a packet_type, and the
+		(exporters, table) the packets nested in it are dispatched with.
+		"""
+		for cls in packet_type.__mro__:
+			own_handler = self.dispatch.get(cls)
+			if own_handler is not None:
+				break
+		else:
+			raise NotImplementedError("Don't know how to export %r" % packet_type)
+
+		handlers: List[Callable] = []
+		nested = None
+		if getattr(own_handler, "__func__", None) not in _BROADCAST_HANDLERS:
+			# Overridden in a subclass
+			handlers.append(own_handler)
+		else:
+			descending = []
+			for exporter in exporters:
+				try:
+					handler, descend = exporter._handlers[packet_type]
+				except KeyError:
+					handler, descend = exporter._resolve_handler(packet_type)
+				if descend and type(exporter).export_packet is not BaseExporter.export_packet:
+					handler, descend = exporter.export_packet, False
+				if handler is not None:
+					handlers.append(handler)
+				if descend:
+					descending.append(exporter)
+			if descending:
+				descending = tuple(descending)
+				nested = descending, self._fan_out.setdefault(descending, {})
+
+		self._fan_out[exporters][packet_type] = handlers, nested
+		return handlers, nested
 
 	def flush(self):
 		for exporter in self.exporters:
@@ -222,6 +455,11 @@ class CompositeExporter(BaseExporter):
 			exporter.handle_shuffle_deck(packet)
 
 
+_BROADCAST_HANDLERS = frozenset(
+	func for name, func in vars(CompositeExporter).items() if name.startswith("handle_")
+)
+
+
 class EntityTreeExporter(BaseExporter):
 	game_class = Game
 	player_class = Player
@@ -235,6 +473,9 @@ class EntityTreeExporter(BaseExporter):
 		packet_tree,
 		player_manager: Optional[PlayerManager] = None,
 		tolerate_missing_entities: bool = False,
+		snapshot_interval: Optional[int] = None,
+		snapshot_turns: bool = False,
+		snapshot_budget: Optional[int] = None,
 	):
 		"""
 		:param tolerate_missing_entities: When True, an operation (TAG_CHANGE, SHOW_ENTITY,
@@ -242,6 +483,14 @@ class EntityTreeExporter(BaseExporter):
 			skipped instead of raising EntityNotFound. Used for BobsBuddy diagnose
 			combat_outcome.py and slice_combat.py scripts since some Battlegrounds logs sometimes
 			reference entities never created: e.g., leaderboard/hero-power tag changes.
+		:param snapshot_interval: When set, `export()` records a snapshot of the game
+			before the first top-level packet following each `snapshot_interval` packets,
+			to speed up `state_at()`.
+		:param snapshot_turns: When True, `export()` records a snapshot of the game before
+			the first top-level packet following each change of turn.
+		:param snapshot_budget: Approximate maximum size of the snapshots, in bytes. When
+			it is exceeded, every other snapshot is dropped and snapshots are recorded
+			half as often.
 		"""
 		super().__init__(packet_tree)
 
@@ -251,6 +500,108 @@ class EntityTreeExporter(BaseExporter):
 
 		self.tolerate_missing_entities = tolerate_missing_entities
 
+		self.snapshot_interval = snapshot_interval
+		self.snapshot_turns = snapshot_turns
+		self.snapshot_budget = snapshot_budget
+		self.snapshots: List[GameSnapshot] = []
+		self._snapshot_ids: List[int] = []
+		self._snapshot_size = 0
+		# Only every `_snapshot_stride` due snapshot is recorded (0: none)
+		self._snapshot_stride = 1
+		self._due_snapshots = 0
+		self._next_snapshot_id = 0
+		self._turn_changed = False
+
+	def export(self, until_packet_id=None, until_turn=None, until=None):
+		if not (self.snapshot_interval or self.snapshot_turns):
+			return super().export(until_packet_id, until_turn, until)
+
+		self.set_stop_condition(until_packet_id, until_turn, until)
+		for index, packet in enumerate(self.packet_tree):
+			if self.game is not None and self._snapshot_due(packet):
+				self._take_snapshot(packet.packet_id, index)
+			self.export_packet(packet)
+			if self.stopped:
+				break
+		self.flush()
+		return self
+
+	def _snapshot_due(self, packet) -> bool:
+		packet_id = getattr(packet, "packet_id", None)
+		if packet_id is None:
+			return False
+		if self._turn_changed:
+			self._turn_changed = False
+			return True
+		return bool(self.snapshot_interval) and packet_id >= self._next_snapshot_id
+
+	def _take_snapshot(self, packet_id: int, index: int):
+		if self.snapshot_interval:
+			self._next_snapshot_id = packet_id + self.snapshot_interval
+		due = self._due_snapshots
+		self._due_snapshots += 1
+		if not self._snapshot_stride or due % self._snapshot_stride:
+			return
+
+		snapshot = take_snapshot(self.game, packet_id, index)
+		self.snapshots.append(snapshot)
+		self._snapshot_ids.append(packet_id)
+		self._snapshot_size += snapshot.size
+
+		budget = self.snapshot_budget
+		if budget is None:
+			return
+		while self._snapshot_size > budget and len(self.snapshots) > 1:
+			self.snapshots = self.snapshots[::2]
+			self._snapshot_ids = self._snapshot_ids[::2]
+			self._snapshot_size = sum(snapshot.size for snapshot in self.snapshots)
+			self._snapshot_stride *= 2
+		if self._snapshot_size > budget:
+			self.snapshots.clear()
+			self._snapshot_ids.clear()
+			self._snapshot_size = 0
+			self._snapshot_stride = 0
+
+	def state_at(self, packet_id: int) -> Optional[Game]:
+		"""
+		Return a new Game in the state following the packet \a packet_id.
+
+		The game is restored from the closest snapshot recorded by `export()`
+		before the packet, and the packets in between are exported again by a
+		new exporter (see `_replay_exporter()`), so the exporter itself is left
+		untouched.
+		"""
+		exporter = self._replay_exporter()
+
+		i = bisect_right(self._snapshot_ids, packet_id + 1) - 1
+		if i >= 0:
+			snapshot = self.snapshots[i]
+			exporter.game = restore_snapshot(snapshot)
+			index = snapshot.index
+		else:
+			exporter.game = None
+			index = 0
+
+		exporter.set_stop_condition(until_packet_id=packet_id)
+		packets = self.packet_tree.packets
+		for index in range(index, len(packets)):
+			exporter.export_packet(packets[index])
+			if exporter.stopped:
+				break
+		return exporter.game
+
+	def _replay_exporter(self) -> "EntityTreeExporter":
+		"""
+		Return a new exporter, configured like this one, that `state_at()`
+		exports packets with. Subclasses whose constructor takes other
+		arguments, or which have their own configuration, should override it.
+		"""
+		return type(self)(
+			self.packet_tree,
+			player_manager=self.player_manager,
+			tolerate_missing_entities=self.tolerate_missing_entities,
+		)
+
 	def find_entity(self, entity_id: int, opcode) -> Optional[Card]:
 		try:
 			entity = self.game.find_entity_by_id(entity_id)
@@ -268,10 +619,9 @@ class EntityTreeExporter(BaseExporter):
 			)
 		return cast(Card, entity)
 
-	def handle_block(self, packet):
+	def handle_block_start(self, packet):
 		if packet.type == BlockType.GAME_RESET:
 			self.game.reset()
-		super().handle_block(packet)
 
 	def handle_create_game(self, packet):
 		self.game = self.game_class(packet.entity)
@@ -353,10 +703,84 @@ class EntityTreeExporter(BaseExporter):
 		if entity is None:
 			return None
 		entity.tag_change(packet.tag, packet.value)
+		if self.snapshot_turns and packet.tag == GameTag.TURN and entity is self.game:
+			self._turn_changed = True
 
 		return entity
 
 
+class TagHistoryExporter(BaseExporter):
+	"""
+	An exporter that records, in a single pass, the history of every tag of
+	every entity as parallel arrays of packet ids and (integer) values, so
+	that the value of a tag at any packet can be looked up with a binary
+	search (see `value_at()`).
+	"""
+	def __init__(self, packet_tree):
+		super().__init__(packet_tree)
+		# Entity id -> tag -> (packet ids, values)
+		self.histories: Dict[int, Dict[int, Tuple[array, array]]] = {}
+
+	def value_at(self, entity_id: int, tag: int, packet_id: int, default=None):
+		"""
+		Return the value of \a tag for the entity \a entity_id after the
+		packet \a packet_id, or \a default if the tag was never set by then.
+		"""
+		history = self.histories.get(entity_id, {}).get(tag)
+		if history is None:
+			return default
+		packet_ids, values = history
+		i = bisect_right(packet_ids, packet_id)
+		if not i:
+			return default
+		return values[i - 1]
+
+	def history(self, entity_id: int, tag: int) -> List[Tuple[int, int]]:
+		"""Return the (packet id, value) changes of \a tag for \a entity_id."""
+		history = self.histories.get(entity_id, {}).get(tag)
+		if history is None:
+			return []
+		return list(zip(*history))
+
+	def _record(self, entity, packet_id: int, tags):
+		entity_id = int(coerce_to_entity_id(entity))
+		entity_histories = self.histories.get(entity_id)
+		if entity_histories is None:
+			entity_histories = self.histories[entity_id] = {}
+		for tag, value in tags:
+			history = entity_histories.get(tag)
+			if history is None:
+				history = entity_histories[tag] = (array("q"), array("q"))
+			history[0].append(packet_id)
+			history[1].append(value)
+		return entity_histories
+
+	def handle_create_game(self, packet):
+		self._record(packet.entity, packet.packet_id, packet.tags)
+		for player in packet.players:
+			self._record(player.entity, player.packet_id, player.tags)
+
+	def handle_full_entity(self, packet):
+		entity_histories = self.histories.get(int(coerce_to_entity_id(packet.entity)))
+		self._record(packet.entity, packet.packet_id, packet.tags)
+		if entity_histories:
+			# The tags of an existing entity are replaced (GAME_RESET): unset the others
+			tags = dict(packet.tags)
+			self._record(packet.entity, packet.packet_id, [
+				(tag, 0) for tag, (_, values) in entity_histories.items()
+				if tag not in tags and values[-1]
+			])
+
+	def handle_show_entity(self, packet):
+		self._record(packet.entity, packet.packet_id, packet.tags)
+
+	def handle_change_entity(self, packet):
+		self._record(packet.entity, packet.packet_id, packet.tags)
+
+	def handle_tag_change(self, packet):
+		self._record(packet.entity, packet.packet_id, ((packet.tag, packet.value), ))
+
+
 class FriendlyPlayerExporter(BaseExporter):
 	"""
 	An exporter that will attempt to guess the friendly player in the game by
@@ -371,11 +795,8 @@ class FriendlyPlayerExporter(BaseExporter):
 		self._non_ai_players = []
 
 	def export(self):
-		for packet in self.packet_tree:
-			self.export_packet(packet)
-			if self.friendly_player is not None:
-				# Stop export once we have it
-				break
+		# Stop export once we have it
+		super().export(until=lambda packet: self.friendly_player is not None)
 		return self.friendly_player
 
 	def handle_create_game(self, packet):
@@ -0,0 +1,113 @@
+"""
+Live parsing of a Power.log that is still being written to.
+
+	async for packet in follow("Power.log"):
+		...
+"""
+import asyncio
+import os
+from typing import AsyncIterator, BinaryIO, List, Optional
+
+from .events import Event, EventType
+from .packets import Packet
+from .parser import LogParser
+
+
+# Bytes read (and lines parsed) per event loop iteration
+CHUNK_SIZE = 256 * 1024
+
+# Seconds to wait before checking the file again once all of it was read
+POLL_INTERVAL = 0.1
+
+
+def _stat(path: str) -> Optional[os.stat_result]:
+	try:
+		return os.stat(path)
+	except FileNotFoundError:
+		return None
+
+
+def _is_same_file(st: Optional[os.stat_result], f: BinaryIO) -> bool:
+	if st is None:
+		return False
+	fst = os.fstat(f.fileno())
+	return (st.st_dev, st.st_ino) == (fst.st_dev, fst.st_ino)
+
+
+async def follow(
+	path: str,
+	parser: Optional[LogParser] = None,
+	start: int = 0,
+	poll_interval: float = POLL_INTERVAL,
+	chunk_size: int = CHUNK_SIZE,
+) -> AsyncIterator[Packet]:
+	"""
+	Tail the Power.log at `path` and yield each packet as soon as the parser
+	adds it to its packet tree. The generator runs until it is closed.
+
+	Packets are yielded before their content is complete: blocks are still
+	empty and FULL_ENTITY tags follow. Use `parser.games` for the full tree.
+
+	Only complete lines are fed to `parser` (by default, a new LogParser),
+	up to `chunk_size` bytes of them per event loop iteration. Reading starts
+	at byte `start`, which can be the `offset` of a parser restored with
+	`LogParser.from_checkpoint()`. When the file is truncated or replaced,
+	as Hearthstone does when it restarts, it is reopened and read from the
+	beginning.
+	"""
+	if parser is None:
+		parser = LogParser()
+	pending: List[Packet] = []
+
+	def on_packet(event: Event):
+		pending.append(event.data)
+
+	parser.subscribe(on_packet, (EventType.PACKET, ))
+
+	f: Optional[BinaryIO] = None
+	partial = b""
+	try:
+		while True:
+			if f is None:
+				try:
+					f = open(path, "rb")
+				except FileNotFoundError:
+					await asyncio.sleep(poll_interval)
+					continue
+				f.seek(start)
+				parser.offset = start
+				start = 0
+				partial = b""
+
+			# A truncated file is reopened right away; a replaced one once the
+			# rest of the old file has been read.
+			st = _stat(path)
+			same_file = _is_same_file(st, f)
+			data = b""
+			if not same_file or st.st_size >= f.tell():
+				data = f.read(chunk_size)
+			if not data:
+				if same_file and st.st_size >= f.tell():
+					await asyncio.sleep(poll_interval)
+				else:
+					f.close()
+					f = None
+					parser.flush()
+				continue
+
+			data = partial + data
+			end = data.rfind(b"\n") + 1
+			partial = data[end:]
+			for line in data[:end].splitlines(keepends=True):
+				parser.read_line_bytes(line)
+
+			for packet in pending:
+				yield packet
+			pending.clear()
+
+			# Let other tasks run between chunks
+			await asyncio.sleep(0)
+	finally:
+		parser.unsubscribe(on_packet)
+		if f is not None:
+			f.close()
@@ -1,17 +1,48 @@
-from hearthstone.enums import PowerType
+import heapq
+from array import array
+from datetime import datetime, time, timedelta
+from operator import itemgetter
+
+from hearthstone.enums import TAG_TYPES, GameTag, PowerType
 
 
 class PacketTree:
-	def __init__(self, ts):
+	__slots__ = (
+		"ts", "packets", "parent", "packet_counter", "spectator_mode", "tag_changes",
+		"packet_index",
+	)
+
+	def __init__(self, ts, columnar=False):
+		"""
+		If `columnar` is set, TagChange packets are stored in the columns of
+		a TagChangeStore (`tag_changes`) instead of as individual objects.
+		See `packet_list()`.
+		"""
 		self.ts = ts
-		self.packets = []
 		self.parent = None
 		self.packet_counter = 0
+		self.spectator_mode = False
+		self.tag_changes = TagChangeStore() if columnar else None
+		self.packets = self.packet_list()
+		self.packet_index = None
 
 	def __iter__(self):
 		for packet in self.packets:
 			yield packet
 
+	@property
+	def columnar(self):
+		return self.tag_changes is not None
+
+	def packet_list(self):
+		"""
+		Return an empty container for the packets of a node of this tree:
+		a plain list, or a PacketList backed by `tag_changes` if columnar.
+		"""
+		if self.tag_changes is None:
+			return []
+		return PacketList(self.tag_changes)
+
 	@property
 	def start_time(self):
 		for packet in self.packets:
@@ -49,8 +80,121 @@ class PacketTree:
 		for packet in _iter_recursive(self.packets, cls):
 			yield packet
 
+	def create_index(self):
+		"""
+		Index the packets currently in the tree by type, see `packets_of()`.
+		Packets added to the tree afterwards must be passed to
+		`packet_index.add()`, as ParsingState.register_packet() does.
+		"""
+		self.packet_index = PacketIndex(self.tag_changes)
+		for packet, row in _iter_nodes(self.packets):
+			self.packet_index.add(packet, row)
+
+	def packets_of(self, cls):
+		"""
+		Return a list of the packets of the tree which are instances of `cls`,
+		in document order. Unlike `recursive_iter()`, this includes the
+		packets nested in SubSpell blocks, CreateGame players and options.
+		Without a `packet_index` (see `create_index()` and the `index` option
+		of LogParser), the whole tree is walked.
+		"""
+		if self.packet_index is not None:
+			return self.packet_index.get(cls)
+
+		ret = []
+		for packet, row in _iter_nodes(self.packets):
+			if row is not None:
+				packet = self.tag_changes.get(row)
+			if isinstance(packet, cls):
+				ret.append(packet)
+		return ret
+
+
+def _iter_nodes(packets):
+	"""
+	Iterate over \a packets and the packets nested in them, in document
+	order, as (packet, row) tuples. TagChange packets stored in the
+	TagChangeStore of a columnar tree are yielded as (None, row).
+	"""
+	if isinstance(packets, PacketList):
+		items = ((None, i) if i >= 0 else (packets._objects[~i], None) for i in packets._order)
+	else:
+		items = ((packet, None) for packet in packets)
+
+	for packet, row in items:
+		yield packet, row
+		if packet is None:
+			continue
+		children = (
+			getattr(packet, "packets", None) or getattr(packet, "players", None) or
+			getattr(packet, "options", None)
+		)
+		if children:
+			yield from _iter_nodes(children)
+
+
+class PacketIndex:
+	"""
+	The packets of a PacketTree by type, in document order.
+	Each packet is stored with its position in the tree, so that the packets
+	of several types can be merged back in order.
+	"""
+	__slots__ = ("packets", "positions", "count", "store", "row_positions")
+
+	def __init__(self, store=None):
+		self.packets = {}
+		self.positions = {}
+		self.count = 0
+		# TagChange packets stored as rows of the TagChangeStore of a columnar
+		# tree are not kept as objects; rows are indexed in the order they are
+		# appended to the store.
+		self.store = store
+		self.row_positions = array("q")
+
+	def add(self, packet, row=None):
+		"""
+		Index \a packet, the last packet added to the tree. If the packet is
+		stored in the TagChangeStore of the tree, \a row is its row.
+		"""
+		position = self.count
+		self.count += 1
+		if row is not None:
+			self.row_positions.append(position)
+			return
+
+		klass = type(packet)
+		packets = self.packets.get(klass)
+		if packets is None:
+			packets = self.packets[klass] = []
+			self.positions[klass] = array("q")
+		packets.append(packet)
+		self.positions[klass].append(position)
+
+	def _entries(self, klass):
+		if klass is TagChange and self.row_positions:
+			rows = zip(self.row_positions, map(self.store.get, range(len(self.row_positions))))
+			if klass not in self.packets:
+				return rows
+			objects = zip(self.positions[klass], self.packets[klass])
+			return heapq.merge(rows, objects, key=itemgetter(0))
+		return zip(self.positions[klass], self.packets[klass])
+
+	def get(self, cls):
+		classes = [klass for klass in self.packets if issubclass(klass, cls)]
+		if self.row_positions and issubclass(TagChange, cls) and TagChange not in classes:
+			classes.append(TagChange)
+
+		if len(classes) == 1 and not (classes[0] is TagChange and self.row_positions):
+			return list(self.packets[classes[0]])
+		return [
+			packet for _, packet in heapq.merge(*map(self._entries, classes), key=itemgetter(0))
+		]
+
 
 class Packet:
+	# Packets are numerous, so every attribute is declared in __slots__.
+	# packet_id is assigned by ParsingState.register_packet().
+	__slots__ = ("ts", "packet_id")
 	power_type = 0
 
 	def __repr__(self):
@@ -58,6 +202,10 @@ class Packet:
 
 
 class Block(Packet):
+	__slots__ = (
+		"entity", "type", "index", "effectid", "effectindex", "target", "suboption",
+		"trigger_keyword", "ended", "packets", "parent",
+	)
 	power_type = PowerType.BLOCK_START
 
 	def __init__(
@@ -74,6 +222,7 @@ class Block(Packet):
 		self.trigger_keyword = trigger_keyword
 		self.ended = False
 		self.packets = []
+		self.parent = None
 
 	def __iter__(self):
 		for packet in self.packets:
@@ -93,6 +242,7 @@ class Block(Packet):
 
 
 class MetaData(Packet):
+	__slots__ = ("meta", "data", "count", "info")
 	power_type = PowerType.META_DATA
 
 	def __init__(self, ts, meta, data, count):
@@ -107,9 +257,12 @@ class MetaData(Packet):
 
 
 class CreateGame(Packet):
+	__slots__ = ("entity", "tags", "players")
 	power_type = PowerType.CREATE_GAME
 
 	class Player(Packet):
+		__slots__ = ("entity", "player_id", "hi", "lo", "tags", "name")
+
 		def __init__(self, ts, entity, player_id, hi, lo):
 			self.ts = ts
 			self.entity = entity
@@ -127,6 +280,7 @@ class CreateGame(Packet):
 
 
 class HideEntity(Packet):
+	__slots__ = ("entity", "zone")
 	power_type = PowerType.HIDE_ENTITY
 
 	def __init__(self, ts, entity, zone):
@@ -136,6 +290,7 @@ class HideEntity(Packet):
 
 
 class FullEntity(Packet):
+	__slots__ = ("entity", "card_id", "tags")
 	power_type = PowerType.FULL_ENTITY
 
 	def __init__(self, ts, entity, card_id):
@@ -146,6 +301,7 @@ class FullEntity(Packet):
 
 
 class ShowEntity(Packet):
+	__slots__ = ("entity", "card_id", "tags")
 	power_type = PowerType.SHOW_ENTITY
 
 	def __init__(self, ts, entity, card_id):
@@ -161,6 +317,7 @@ class ShowEntity(Packet):
 
 
 class ChangeEntity(Packet):
+	__slots__ = ("entity", "card_id", "tags")
 	power_type = PowerType.CHANGE_ENTITY
 
 	def __init__(self, ts, entity, card_id):
@@ -171,6 +328,7 @@ class ChangeEntity(Packet):
 
 
 class TagChange(Packet):
+	__slots__ = ("entity", "tag", "value", "has_change_def")
 	power_type = PowerType.TAG_CHANGE
 
 	def __init__(self, ts, entity, tag, value, has_change_def=False):
@@ -182,6 +340,8 @@ class TagChange(Packet):
 
 
 class Choices(Packet):
+	__slots__ = ("entity", "id", "tasklist", "type", "min", "max", "source", "choices")
+
 	def __init__(self, ts, entity, id, tasklist, type, min, max):
 		self.ts = ts
 		self.entity = entity
@@ -199,6 +359,8 @@ class Choices(Packet):
 
 
 class SendChoices(Packet):
+	__slots__ = ("entity", "id", "type", "choices")
+
 	def __init__(self, ts, id, type):
 		self.ts = ts
 		self.entity = None
@@ -208,6 +370,8 @@ class SendChoices(Packet):
 
 
 class ChosenEntities(Packet):
+	__slots__ = ("entity", "id", "choices")
+
 	def __init__(self, ts, entity, id):
 		self.ts = ts
 		self.entity = entity
@@ -216,6 +380,8 @@ class ChosenEntities(Packet):
 
 
 class Options(Packet):
+	__slots__ = ("entity", "id", "options")
+
 	def __init__(self, ts, id):
 		self.ts = ts
 		self.entity = None
@@ -224,6 +390,8 @@ class Options(Packet):
 
 
 class Option(Packet):
+	__slots__ = ("entity", "id", "type", "optype", "error", "error_param", "options")
+
 	def __init__(self, ts, entity, id, type, optype, error, error_param):
 		self.ts = ts
 		self.entity = entity
@@ -236,6 +404,8 @@ class Option(Packet):
 
 
 class SendOption(Packet):
+	__slots__ = ("entity", "option", "suboption", "target", "position")
+
 	def __init__(self, ts, option, suboption, target, position):
 		self.ts = ts
 		self.entity = None
@@ -246,11 +416,16 @@ class SendOption(Packet):
 
 
 class ResetGame(Packet):
+	__slots__ = ()
+
 	def __init__(self, ts):
 		self.ts = ts
 
 
 class SubSpell(Packet):
+	__slots__ = (
+		"spell_prefab_guid", "source", "target_count", "ended", "targets", "packets", "parent"
+	)
 	power_type = PowerType.SUB_SPELL_START
 
 	def __init__(self, ts, spell_prefab_guid, source, target_count):
@@ -261,6 +436,7 @@ class SubSpell(Packet):
 		self.ended = False
 		self.targets = []
 		self.packets = []
+		self.parent = None
 
 	def __repr__(self):
 		return "%s(spell_prefab_guid=%r, source=%r)" % (
@@ -272,6 +448,7 @@ class SubSpell(Packet):
 
 
 class CachedTagForDormantChange(Packet):
+	__slots__ = ("entity", "tag", "value")
 	power_type = PowerType.CACHED_TAG_FOR_DORMANT_CHANGE
 
 	def __init__(self, ts, entity, tag, value):
@@ -282,6 +459,7 @@ class CachedTagForDormantChange(Packet):
 
 
 class VOSpell(Packet):
+	__slots__ = ("brguid", "vospguid", "blocking", "delayms")
 	power_type = PowerType.VO_SPELL
 
 	def __init__(self, ts, brguid, vospguid, blocking, delayms):
@@ -293,8 +471,197 @@ class VOSpell(Packet):
 
 
 class ShuffleDeck(Packet):
+	__slots__ = ("player_id",)
 	power_type = PowerType.SHUFFLE_DECK
 
 	def __init__(self, ts, player_id):
 		self.ts = ts
 		self.player_id = player_id
+
+
+class TagChangeStore:
+	"""
+	Column storage for the TagChange packets of a columnar PacketTree.
+	Each TagChange is a row of integer arrays; rows are turned back into
+	TagChange objects by `get()`, with the same attribute values and types.
+	"""
+	HAS_CHANGE_DEF = 1
+	TAG_ENUM = 2
+	VALUE_ENUM = 4
+	ENTITY_REF = 8
+	NO_ENTITY = 16
+
+	_MIN_INT, _MAX_INT = -2 ** 63, 2 ** 63 - 1
+
+	def __init__(self):
+		self.packet_id = array("q")
+		self.entity = array("q")
+		self.tag = array("q")
+		self.value = array("q")
+		# Microseconds since midnight (time) or since `ts_base` (datetime)
+		self.ts = array("q")
+		self.flags = array("B")
+		# Non-integer entities (PlayerReference), referenced by index
+		self.entity_refs = []
+		self.ts_base = None
+
+	def __len__(self):
+		return len(self.flags)
+
+	def _encode_ts(self, ts):
+		if type(ts) is time:
+			if self.ts_base is None:
+				self.ts_base = ts
+			if ts.tzinfo is None and type(self.ts_base) is time:
+				return (
+					(ts.hour * 60 + ts.minute) * 60 + ts.second
+				) * 1000000 + ts.microsecond
+		elif type(ts) is datetime:
+			if self.ts_base is None:
+				self.ts_base = ts
+			elif type(self.ts_base) is not datetime or ts.tzinfo is not self.ts_base.tzinfo:
+				return None
+			return (ts - self.ts_base) // timedelta(microseconds=1)
+
+	def _decode_ts(self, offset):
+		if type(self.ts_base) is datetime:
+			return self.ts_base + timedelta(microseconds=offset)
+		offset, microsecond = divmod(offset, 1000000)
+		offset, second = divmod(offset, 60)
+		hour, minute = divmod(offset, 60)
+		return time(hour, minute, second, microsecond)
+
+	def append(self, packet):
+		"""
+		Store `packet` as a new row and return its index, or return None if
+		the packet cannot be represented in columns.
+		"""
+		if type(packet) is not TagChange:
+			return None
+
+		packet_id = getattr(packet, "packet_id", None)
+		tag, value, entity = packet.tag, packet.value, packet.entity
+		if type(packet_id) is not int:
+			return None
+
+		flags = self.HAS_CHANGE_DEF if packet.has_change_def else 0
+		if type(tag) is GameTag:
+			flags |= self.TAG_ENUM
+		elif type(tag) is not int:
+			return None
+		if type(value) is not int:
+			if type(value) is not TAG_TYPES.get(tag):
+				return None
+			flags |= self.VALUE_ENUM
+		if not (
+			self._MIN_INT <= tag <= self._MAX_INT and self._MIN_INT <= value <= self._MAX_INT
+		):
+			return None
+
+		if entity is None:
+			flags |= self.NO_ENTITY
+			entity = 0
+		elif type(entity) is not int:
+			for i, ref in enumerate(self.entity_refs):
+				if ref is entity:
+					break
+			else:
+				i = len(self.entity_refs)
+				self.entity_refs.append(entity)
+			flags |= self.ENTITY_REF
+			entity = i
+		elif not self._MIN_INT <= entity <= self._MAX_INT:
+			return None
+
+		ts = self._encode_ts(packet.ts)
+		if ts is None:
+			return None
+
+		self.packet_id.append(packet_id)
+		self.entity.append(entity)
+		self.tag.append(tag)
+		self.value.append(value)
+		self.ts.append(ts)
+		self.flags.append(flags)
+		return len(self.flags) - 1
+
+	def get(self, row):
+		"""
+		Return a new TagChange packet for `row`. Changes made to it are not
+		written back to the store.
+		"""
+		flags = self.flags[row]
+
+		if flags & self.NO_ENTITY:
+			entity = None
+		elif flags & self.ENTITY_REF:
+			entity = self.entity_refs[self.entity[row]]
+		else:
+			entity = self.entity[row]
+
+		tag = self.tag[row]
+		if flags & self.TAG_ENUM:
+			tag = GameTag(tag)
+		value = self.value[row]
+		if flags & self.VALUE_ENUM:
+			value = TAG_TYPES[tag](value)
+
+		packet = TagChange(
+			self._decode_ts(self.ts[row]), entity, tag, value,
+			bool(flags & self.HAS_CHANGE_DEF)
+		)
+		packet.packet_id = self.packet_id[row]
+		return packet
+
+
+class PacketList:
+	"""
+	List-like packet container of a columnar PacketTree.
+	TagChange packets are stored as rows of the tree's TagChangeStore and
+	handed out as new TagChange objects on access; all other packets are
+	kept as they are. Only appending is supported.
+	"""
+	__slots__ = ("_store", "_order", "_objects")
+
+	def __init__(self, store: TagChangeStore):
+		self._store = store
+		# Store row (>= 0) or bitwise complement of an index into _objects
+		self._order = array("q")
+		self._objects = []
+
+	def __repr__(self):
+		return "%s(%r)" % (self.__class__.__name__, list(self))
+
+	def __len__(self):
+		return len(self._order)
+
+	def __iter__(self):
+		get_row = self._store.get
+		objects = self._objects
+		for i in self._order:
+			yield get_row(i) if i >= 0 else objects[~i]
+
+	def __reversed__(self):
+		for i in reversed(self._order):
+			yield self._get(i)
+
+	def __getitem__(self, index):
+		if isinstance(index, slice):
+			return [self._get(i) for i in self._order[index]]
+		return self._get(self._order[index])
+
+	def _get(self, i):
+		return self._store.get(i) if i >= 0 else self._objects[~i]
+
+	def append(self, packet: Packet):
+		"""
+		Append \a packet. Return its row in the TagChangeStore, or None if it
+		is kept as an object.
+		"""
+		row = self._store.append(packet)
+		if row is None:
+			self._order.append(~len(self._objects))
+			self._objects.append(packet)
+		else:
+			self._order.append(row)
+		return row
@@ -1,21 +1,35 @@
 import logging
+import mmap
+import os
+import pickle
+import re
 from datetime import datetime, timedelta
-from typing import Any, Callable, Dict, Optional, Union
+from functools import lru_cache
+from typing import Any, Callable, Dict, Iterable, List, Optional, Union
 
-from aniso8601 import parse_time
 from hearthstone.enums import (
 	BlockType, ChoiceType, FormatType, GameTag, GameType,
 	MetaDataType, Mulligan, OptionType, PowerType
 )
 
 from . import packets, tokens
+from .events import BLOCK_TYPES, OPEN_PACKET_TYPES, Event, EventType
 from .exceptions import CorruptLogError, NoSuchEnum, ParsingError, RegexParsingError
 from .packets import (
 	Block, Choices, ChosenEntities, CreateGame,
 	MetaData, Packet, PacketTree, SendChoices, SubSpell
 )
 from .player import PlayerManager, PlayerReference, coerce_to_entity_id
-from .utils import parse_enum, parse_tag
+from .utils import parse_enum, parse_powerlog_time, parse_tag
+
+
+# Upper bound on the number of distinct (tag, value) string pairs memoized
+# by ParsingState.parse_tag(). Logs typically contain a few hundred.
+TAG_CACHE_SIZE = 4096
+
+# Upper bound on the number of entity descriptors memoized per game by
+# ParsingState.parse_entity_id(); the cache is emptied once it is reached.
+ENTITY_CACHE_SIZE = 65536
 
 
 class ParsingState:
@@ -38,6 +52,106 @@ class ParsingState:
 		self.metadata_node: Optional[MetaData] = None
 		self.send_choice_packet: Optional[SendChoices] = None
 
+		# Create columnar PacketTrees (see packets.TagChangeStore)
+		self.columnar = False
+		# Index the packets of new PacketTrees by type (see PacketTree.create_index())
+		self.index = False
+
+		# Event callbacks by event type (types without any are left out), not pickled
+		self.subscribers: Dict[EventType, List[Callable[[Event], Any]]] = {}
+		# Object called directly, without events, with each game and each packet
+		# added to its top level: `game_start(packet_tree)`, `packet(packet_tree,
+		# packet)` and `game_end(packet_tree)` (see pipeline.ExportPipeline), not pickled
+		self.packet_sink: Any = None
+		# Emitted packets that are not final yet
+		self._open_packets: List[Packet] = []
+		self._game_ended = False
+		self._resolved_player_count = 0
+
+		# Memoized utils.parse_tag(); errors are not cached and propagate as usual
+		self.parse_tag = lru_cache(maxsize=TAG_CACHE_SIZE)(parse_tag)
+
+		# Per-game caches of raw entity descriptors, emptied in register_game()
+		self._entity_id_cache: Dict[str, int] = {}
+		self._player_cache: Dict[str, PlayerReference] = {}
+
+	def __getstate__(self):
+		# The memoized parse_tag() can't be pickled; it is recreated empty
+		state = self.__dict__.copy()
+		del state["parse_tag"]
+		state["subscribers"] = {}
+		state["packet_sink"] = None
+		return state
+
+	def __setstate__(self, state):
+		self.__dict__.update(state)
+		self.parse_tag = lru_cache(maxsize=TAG_CACHE_SIZE)(parse_tag)
+
+	def emit(self, event_type: EventType, ts, data, final: bool):
+		callbacks = self.subscribers.get(event_type)
+		if callbacks:
+			event = Event(event_type, ts, data, final)
+			for callback in callbacks:
+				callback(event)
+
+	def _finalize_packets(self, keep_game_open: bool = False):
+		open_packets = []
+		for packet in self._open_packets:
+			if keep_game_open and packet is self.game_packet:
+				open_packets.append(packet)
+			else:
+				self.emit(EventType.PACKET_FINAL, packet.ts, packet, True)
+		self._open_packets = open_packets
+
+	def emit_resolved_players(self, ts):
+		if self._resolved_player_count >= self.manager.resolved_player_count:
+			return
+		players = self.manager.resolved_players()
+		while self._resolved_player_count < len(players):
+			player = players[self._resolved_player_count]
+			self._resolved_player_count += 1
+			self.emit(EventType.PLAYER_RESOLVED, ts, player, True)
+
+	def start_game(self, packet_tree: PacketTree):
+		self.end_game()
+		self._game_ended = False
+		self.games.append(packet_tree)
+		self.current_block = packet_tree
+		self.packet_tree = packet_tree
+		if self.subscribers:
+			self.emit(EventType.GAME_START, packet_tree.ts, packet_tree, False)
+		if self.packet_sink is not None:
+			self.packet_sink.game_start(packet_tree)
+
+	def end_game(self):
+		"""
+		Emit the GAME_END event of the current game, after finalizing all of
+		its packets (including blocks that were never closed).
+		"""
+		packet_tree = self.packet_tree
+		if packet_tree is None or self._game_ended:
+			return
+		if not self.subscribers and self.packet_sink is None:
+			return
+
+		self._finalize_packets()
+		block = self.current_block
+		while block is not None and block is not packet_tree:
+			self.emit(EventType.PACKET_FINAL, block.ts, block, True)
+			block = block.parent
+		self._game_ended = True
+		self.emit(EventType.GAME_END, packet_tree.ts, packet_tree, True)
+		if self.packet_sink is not None:
+			self.packet_sink.game_end(packet_tree)
+
+	def close_block(self, ts):
+		block = self.current_block
+		self.current_block = block.parent
+		if self.subscribers:
+			self.emit(EventType.BLOCK_END, ts, block, True)
+			self.emit(EventType.PACKET_FINAL, block.ts, block, True)
+		return block
+
 	def block_end(self, ts):
 		if not self.current_block.parent:
 			logging.warning("[%s] Orphaned BLOCK_END detected", ts)
@@ -46,9 +160,7 @@ class ParsingState:
 		if isinstance(self.current_block, Block):
 			self.current_block.end()
 
-		block = self.current_block
-		self.current_block = self.current_block.parent
-		return block
+		return self.close_block(ts)
 
 	def _register_player_name_mulligan(self, player: PlayerReference, packet: Choices):
 		"""
@@ -98,7 +210,26 @@ class ParsingState:
 		if self.send_choice_packet:
 			self.send_choice_packet = None
 
+		if self._open_packets:
+			# While players are being declared, the game packet is still open
+			self._finalize_packets(keep_game_open=isinstance(
+				self.entity_packet, (CreateGame, CreateGame.Player)
+			))
+
 	def parse_entity_id(self, entity: str) -> int:
+		try:
+			return self._entity_id_cache[entity]
+		except KeyError:
+			pass
+
+		entity_id = self._parse_entity_id(entity)
+		if entity_id is not None:
+			if len(self._entity_id_cache) >= ENTITY_CACHE_SIZE:
+				self._entity_id_cache.clear()
+			self._entity_id_cache[entity] = entity_id
+		return entity_id
+
+	def _parse_entity_id(self, entity: str) -> Optional[int]:
 		if entity.isdecimal():
 			return int(entity)
 
@@ -114,15 +245,27 @@ class ParsingState:
 		if entity == "-1":
 			return
 
+		player = self._player_cache.get(entity)
+		if player is not None and self.manager.is_resolved(player, entity):
+			return player
+
 		entity_id = self.parse_entity_id(entity)
 		if entity_id is None:
 			# Only case where an id is None is if it's a Player name
-			return self.manager.create_or_update_player(name=entity)
+			player = self.manager.create_or_update_player(name=entity)
+
+			# Only fully resolved players are cached: until then, looking the
+			# name up again may still update or replace the reference.
+			if self.manager.is_resolved(player, entity):
+				self._player_cache[entity] = player
+			return player
 		return entity_id
 
 	def register_game(self, _ts: int, entity_id: int):
 		# Use the timestamp from CREATE_GAME because it's earlier
 		ts = self.packet_tree.ts
+		self._entity_id_cache.clear()
+		self._player_cache.clear()
 		self.game_packet = self.entity_packet = packets.CreateGame(ts, entity_id)
 		self.register_packet(self.game_packet)
 		return self.game_packet
@@ -130,9 +273,26 @@ class ParsingState:
 	def register_packet(self, packet: Packet, node=None):
 		if node is None:
 			node = self.current_block.packets
-		node.append(packet)
-		self.packet_tree.packet_counter += 1
-		packet.packet_id = self.packet_tree.packet_counter
+		packet_tree = self.packet_tree
+		packet_tree.packet_counter += 1
+		packet.packet_id = packet_tree.packet_counter
+		row = node.append(packet)
+		if packet_tree.packet_index is not None:
+			packet_tree.packet_index.add(packet, row)
+		if self.subscribers:
+			self.emit_packet(packet)
+		if self.packet_sink is not None and node is packet_tree.packets:
+			self.packet_sink.packet(packet_tree, packet)
+
+	def emit_packet(self, packet: Packet):
+		if isinstance(packet, BLOCK_TYPES):
+			self.emit(EventType.PACKET, packet.ts, packet, False)
+			self.emit(EventType.BLOCK_START, packet.ts, packet, False)
+		elif isinstance(packet, OPEN_PACKET_TYPES):
+			self._open_packets.append(packet)
+			self.emit(EventType.PACKET, packet.ts, packet, False)
+		else:
+			self.emit(EventType.PACKET, packet.ts, packet, True)
 
 	def register_player(self, ts, entity_id: int, player_id: int, hi: int, lo: int):
 		hi = int(hi)
@@ -156,7 +316,7 @@ class ParsingState:
 			self.spectating_second_player = second
 
 
-def parse_initial_tag(data):
+def parse_initial_tag(data, parse=parse_tag):
 	"""
 	Parse \a data, a line formatted as tag=FOO value=BAR
 	Returns the values as int.
@@ -165,7 +325,16 @@ def parse_initial_tag(data):
 	if not sre:
 		raise RegexParsingError(data)
 	tag, value = sre.groups()
-	return parse_tag(tag, value)
+	return parse(tag, value)
+
+
+def _decode_line(data) -> str:
+	try:
+		return str(data, "utf-8")
+	except UnicodeDecodeError as e:
+		raise CorruptLogError(
+			"Log contains invalid UTF-8 (%s): %r" % (e.reason, bytes(data))
+		) from e
 
 
 def clean_option_errors(error, error_param):
@@ -187,21 +356,75 @@ def clean_option_errors(error, error_param):
 
 
 class HandlerBase:
+	"""
+	Base class for line handlers.
+
+	Handlers declare the log methods they process in the `callbacks` class
+	attribute, which maps a method name (without the "GameState." processor
+	prefix) to the name of the handler method to call for it. The LogParser
+	collects these into a routing table once, at construction.
+	To handle additional methods, a subclass extends the mapping and is then
+	registered with `LogParser.register_handler()`:
+
+		class MyChoicesHandler(ChoicesHandler):
+			callbacks = {**ChoicesHandler.callbacks, "DebugPrintFoo": "handle_foo"}
+	"""
+	callbacks: Dict[str, str] = {}
+
 	def __init__(self):
 		self._game_state_processor = "GameState"
 
 	def parse_method(self, m):
 		return "%s.%s" % (self._game_state_processor, m)
 
-	def find_callback(self, method: str) -> Callable[[ParsingState, int, Any], Any]:
-		raise NotImplementedError()
+	def get_callbacks(self) -> Dict[str, Callable[[ParsingState, Any, str], Any]]:
+		"""Return a mapping of full method names to their bound callbacks."""
+		return {
+			self.parse_method(method): getattr(self, name)
+			for method, name in self.callbacks.items()
+		}
+
+	def find_callback(self, method: str) -> Optional[Callable[[ParsingState, Any, str], Any]]:
+		return self.get_callbacks().get(method)
 
 
 class PowerHandler(HandlerBase):
+	callbacks = {
+		"DebugPrintPower": "handle_data",
+		"DebugPrintGame": "handle_game",
+	}
+
+	# Power opcodes whose lines are matched by a single regex, mapped to the
+	# name of the callback receiving the regex groups. These (TAG_CHANGE in
+	# particular) are routed with one dict lookup; the opcodes with several line
+	# formats (BLOCK_START, FULL_ENTITY) are special-cased in handle_power.
+	power_routes = {
+		"CREATE_GAME": (tokens.CREATE_GAME_RE, "create_game"),
+		"ACTION_END": (tokens.BLOCK_END_RE, "block_end"),
+		"BLOCK_END": (tokens.BLOCK_END_RE, "block_end"),
+		"SHOW_ENTITY": (tokens.SHOW_ENTITY_RE, "show_entity"),
+		"HIDE_ENTITY": (tokens.HIDE_ENTITY_RE, "hide_entity"),
+		"CHANGE_ENTITY": (tokens.CHANGE_ENTITY_RE, "change_entity"),
+		"TAG_CHANGE": (tokens.TAG_CHANGE_RE, "tag_change"),
+		"META_DATA": (tokens.META_DATA_RE, "meta_data"),
+		"RESET_GAME": (tokens.RESET_GAME_RE, "reset_game"),
+		"SUB_SPELL_START": (tokens.SUB_SPELL_START_RE, "sub_spell_start"),
+		"SUB_SPELL_END": (tokens.SUB_SPELL_END_RE, "sub_spell_end"),
+		"CACHED_TAG_FOR_DORMANT_CHANGE": (
+			tokens.CACHED_TAG_FOR_DORMANT_CHANGE_RE, "cached_tag_for_dormant_change"
+		),
+		"VO_SPELL": (tokens.VO_SPELL_RE, "vo_spell"),
+		"SHUFFLE_DECK": (tokens.SHUFFLE_DECK_RE, "shuffle_deck"),
+	}
+
 	def __init__(self):
 		super().__init__()
 
 		self._creating_game = False
+		self._power_routes = {
+			opcode: (regex, getattr(self, name))
+			for opcode, (regex, name) in self.power_routes.items()
+		}
 
 	@staticmethod
 	def _check_for_mulligan_hack(ps: ParsingState, ts, tag, value):
@@ -216,12 +439,6 @@ class PowerHandler(HandlerBase):
 				logging.warning("[%s] Broken mulligan nesting. Working around...", ts)
 				ps.block_end(ts)
 
-	def find_callback(self, method):
-		if method == self.parse_method("DebugPrintPower"):
-			return self.handle_data
-		elif method == self.parse_method("DebugPrintGame"):
-			return self.handle_game
-
 	@staticmethod
 	def handle_game(ps: ParsingState, _ts, data):
 		if data.startswith("PlayerID="):
@@ -247,7 +464,7 @@ class PowerHandler(HandlerBase):
 			ps.game_meta[key] = value
 
 	def handle_data(self, ps: ParsingState, ts, data):
-		opcode = data.split()[0]
+		opcode = data.split(None, 1)[0]
 
 		if opcode == "ERROR:":
 			# Line error... skip
@@ -281,7 +498,7 @@ class PowerHandler(HandlerBase):
 				int(lo_str)
 			)
 		elif opcode.startswith("tag="):
-			tag, value = parse_initial_tag(data)
+			tag, value = parse_initial_tag(data, ps.parse_tag)
 
 			assert hasattr(ps.entity_packet, "tags")
 			ps.entity_packet.tags.append((tag, value))  # noqa
@@ -332,8 +549,9 @@ class PowerHandler(HandlerBase):
 	def handle_power(self, ps: ParsingState, ts, opcode, data):
 		ps.flush()
 
-		if opcode == "CREATE_GAME":
-			regex, callback = tokens.CREATE_GAME_RE, self.create_game
+		route = self._power_routes.get(opcode)
+		if route is not None:
+			regex, callback = route
 		elif opcode in ("ACTION_START", "BLOCK_START"):
 			index = None
 			effectid, effectindex = None, None
@@ -383,38 +601,11 @@ class PowerHandler(HandlerBase):
 				trigger_keyword
 			)
 			return
-		elif opcode in ("ACTION_END", "BLOCK_END"):
-			regex, callback = tokens.BLOCK_END_RE, self.block_end
 		elif opcode == "FULL_ENTITY":
 			if data.startswith("FULL_ENTITY - Updating"):
 				regex, callback = tokens.FULL_ENTITY_UPDATE_RE, self.full_entity_update
 			else:
 				regex, callback = tokens.FULL_ENTITY_CREATE_RE, self.full_entity
-		elif opcode == "SHOW_ENTITY":
-			regex, callback = tokens.SHOW_ENTITY_RE, self.show_entity
-		elif opcode == "HIDE_ENTITY":
-			regex, callback = tokens.HIDE_ENTITY_RE, self.hide_entity
-		elif opcode == "CHANGE_ENTITY":
-			regex, callback = tokens.CHANGE_ENTITY_RE, self.change_entity
-		elif opcode == "TAG_CHANGE":
-			regex, callback = tokens.TAG_CHANGE_RE, self.tag_change
-		elif opcode == "META_DATA":
-			regex, callback = tokens.META_DATA_RE, self.meta_data
-		elif opcode == "RESET_GAME":
-			regex, callback = tokens.RESET_GAME_RE, self.reset_game
-		elif opcode == "SUB_SPELL_START":
-			regex, callback = tokens.SUB_SPELL_START_RE, self.sub_spell_start
-		elif opcode == "SUB_SPELL_END":
-			regex, callback = tokens.SUB_SPELL_END_RE, self.sub_spell_end
-		elif opcode == "CACHED_TAG_FOR_DORMANT_CHANGE":
-			regex, callback = (
-				tokens.CACHED_TAG_FOR_DORMANT_CHANGE_RE,
-				self.cached_tag_for_dormant_change
-			)
-		elif opcode == "VO_SPELL":
-			regex, callback = tokens.VO_SPELL_RE, self.vo_spell
-		elif opcode == "SHUFFLE_DECK":
-			regex, callback = tokens.SHUFFLE_DECK_RE, self.shuffle_deck
 		else:
 			raise NotImplementedError(data)
 
@@ -428,12 +619,11 @@ class PowerHandler(HandlerBase):
 
 	@staticmethod
 	def create_game(ps: ParsingState, ts):
-		pt = packets.PacketTree(ts)
+		pt = packets.PacketTree(ts, columnar=ps.columnar)
 		pt.spectator_mode = ps.spectator_mode
-
-		ps.games.append(pt)
-		ps.current_block = pt
-		ps.packet_tree = pt
+		if ps.index:
+			pt.create_index()
+		ps.start_game(pt)
 
 	@staticmethod
 	def block_end(ps, ts):
@@ -462,6 +652,8 @@ class PowerHandler(HandlerBase):
 			trigger_keyword
 		)
 		block.parent = ps.current_block
+		if ps.packet_tree.columnar:
+			block.packets = ps.packet_tree.packet_list()
 		ps.register_packet(block)
 		ps.current_block = block
 		return block
@@ -498,7 +690,7 @@ class PowerHandler(HandlerBase):
 	@staticmethod
 	def hide_entity(ps: ParsingState, ts, entity, tag, value):
 		entity_id = ps.parse_entity_id(entity)
-		tag, value = parse_tag(tag, value)
+		tag, value = ps.parse_tag(tag, value)
 
 		if tag != GameTag.ZONE:
 			raise ParsingError("HIDE_ENTITY got non-zone tag (%r)" % tag)
@@ -562,7 +754,7 @@ class PowerHandler(HandlerBase):
 
 	def tag_change(self, ps: ParsingState, ts, e, tag, value, def_change):
 		entity = ps.parse_entity_or_player(e)
-		tag, value = parse_tag(tag, value)
+		tag, value = ps.parse_tag(tag, value)
 		self._check_for_mulligan_hack(ps, ts, tag, value)
 
 		if tag == GameTag.CONTROLLER:
@@ -596,6 +788,8 @@ class PowerHandler(HandlerBase):
 
 		sub_spell = packets.SubSpell(ts, spell_prefab_guid, source, target_count)
 		sub_spell.parent = ps.current_block
+		if ps.packet_tree.columnar:
+			sub_spell.packets = ps.packet_tree.packet_list()
 		ps.register_packet(sub_spell)
 		ps.current_block = sub_spell
 		return sub_spell
@@ -609,14 +803,12 @@ class PowerHandler(HandlerBase):
 		if isinstance(ps.current_block, SubSpell):
 			ps.current_block.end()
 
-		sub_spell = ps.current_block
-		ps.current_block = ps.current_block.parent
-		return sub_spell
+		return ps.close_block(ts)
 
 	@staticmethod
 	def cached_tag_for_dormant_change(ps: ParsingState, ts, e, tag, value):
 		entity_id = ps.parse_entity_id(e)
-		tag, value = parse_tag(tag, value)
+		tag, value = ps.parse_tag(tag, value)
 
 		packet = packets.CachedTagForDormantChange(ts, entity_id, tag, value)
 		ps.register_packet(packet)
@@ -636,6 +828,11 @@ class PowerHandler(HandlerBase):
 
 
 class OptionsHandler(HandlerBase):
+	callbacks = {
+		"SendOption": "handle_send_option",
+		"DebugPrintOptions": "handle_options",
+	}
+
 	def __init__(self):
 		super().__init__()
 
@@ -643,12 +840,6 @@ class OptionsHandler(HandlerBase):
 		self._options_packet = None
 		self._suboption_packet = None
 
-	def find_callback(self, method):
-		if method == self.parse_method("SendOption"):
-			return self.handle_send_option
-		elif method == self.parse_method("DebugPrintOptions"):
-			return self.handle_options
-
 	def _parse_option_packet(self, ps: ParsingState, ts, data):
 		if " errorParam=" in data:
 			sre = tokens.OPTIONS_OPTION_ERROR_RE.match(data)
@@ -739,7 +930,13 @@ class OptionsHandler(HandlerBase):
 			entity_id, = sre.groups()
 			entity_id = int(entity_id)
 			self._options_packet = packets.Options(ts, entity_id)
-			ps.current_block.packets.append(self._options_packet)
+			row = ps.current_block.packets.append(self._options_packet)
+			if ps.packet_tree.packet_index is not None:
+				ps.packet_tree.packet_index.add(self._options_packet, row)
+			if ps.subscribers:
+				ps.emit_packet(self._options_packet)
+			if ps.packet_sink is not None and ps.current_block is ps.packet_tree:
+				ps.packet_sink.packet(ps.packet_tree, self._options_packet)
 		elif data.startswith("option "):
 			return self._parse_option_packet(ps, ts, data)
 		elif data.startswith(("subOption ", "target ")):
@@ -764,19 +961,16 @@ class OptionsHandler(HandlerBase):
 
 
 class ChoicesHandler(HandlerBase):
+	callbacks = {
+		"DebugPrintEntityChoices": "handle_entity_choices",
+		"DebugPrintChoices": "handle_entity_choices_old",
+		"SendChoices": "handle_send_choices",
+		"DebugPrintEntitiesChosen": "handle_entities_chosen",
+	}
+
 	def __init__(self):
 		super().__init__()
 
-	def find_callback(self, method):
-		if method == self.parse_method("DebugPrintEntityChoices"):
-			return self.handle_entity_choices
-		elif method == self.parse_method("DebugPrintChoices"):
-			return self.handle_entity_choices_old
-		elif method == self.parse_method("SendChoices"):
-			return self.handle_send_choices
-		elif method == self.parse_method("DebugPrintEntitiesChosen"):
-			return self.handle_entities_chosen
-
 	def handle_entity_choices_old(self, ps: ParsingState, ts, data):
 		if data.startswith("id="):
 			sre = tokens.CHOICES_CHOICE_OLD_1_RE.match(data)
@@ -1009,21 +1203,108 @@ class SpectatorModeHandler:
 
 
 class LogParser:
-	def __init__(self):
+	def __init__(self, columnar: bool = False, index: bool = False):
+		"""
+		If `columnar` is set, games are parsed into columnar PacketTrees, which
+		store TagChange packets in arrays rather than as individual objects.
+
+		If `index` is set, the packets of each game are indexed by type while
+		parsing, for fast `PacketTree.packets_of()` lookups. The index costs
+		about 17 bytes per packet (growing an object tree from about 121 to
+		138 bytes per packet, and a columnar tree from about 52 to 60 bytes).
+		"""
 		self.line_regex = tokens.POWERLOG_LINE_RE
 		self._current_date = None
 		self._synced_timestamp = False
 		self._last_ts = None
 
+		# Byte offset reached by read_path() (or bytes read by read_line_bytes())
+		self.offset = 0
+
 		self._parsing_state = ParsingState()
+		self._parsing_state.columnar = columnar
+		self._parsing_state.index = index
 
 		self._power_handler = PowerHandler()
 		self._choices_handler = ChoicesHandler()
 		self._options_handler = OptionsHandler()
 		self._spectator_mode_handler = SpectatorModeHandler()
 
+		self._handlers: List[HandlerBase] = [
+			self._power_handler, self._choices_handler, self._options_handler
+		]
+		self._callbacks: Dict[str, Callable[[ParsingState, Any, str], Any]] = {}
+		for handler in self._handlers:
+			for method, callback in handler.get_callbacks().items():
+				self._callbacks.setdefault(method, callback)
+		self._callbacks_bytes = {
+			method.encode(): callback for method, callback in self._callbacks.items()
+		}
+
+	def register_handler(self, handler: HandlerBase):
+		"""
+		Route the methods declared by `handler` to it.
+		Methods already handled by another handler are taken over by `handler`.
+		"""
+		self._handlers.append(handler)
+		for method, callback in handler.get_callbacks().items():
+			self._callbacks[method] = callback
+			self._callbacks_bytes[method.encode()] = callback
+
 	def flush(self):
-		self._parsing_state.flush()
+		ps = self._parsing_state
+		ps.flush()
+		if ps.subscribers:
+			ps.emit_resolved_players(self._last_ts[1] if self._last_ts else None)
+		ps.end_game()
+
+	def subscribe(
+		self,
+		callback: Callable[[Event], Any],
+		types: Optional[Iterable[EventType]] = None
+	):
+		"""
+		Call `callback` with an `events.Event` for each event of the given
+		`types` (default: all) while parsing.
+
+		Events for packets that the parser still fills in later (entities and
+		their tags, blocks and their content, choices, options...) are not
+		final: a PACKET_FINAL event follows once they are complete. This is
+		the case after the next line that moves the parser on, which also
+		registers player names from mulligan choices, and at the latest at
+		GAME_END, emitted when the next game starts or on `flush()`.
+		Subscribers are not included in checkpoints.
+		"""
+		subscribers = self._parsing_state.subscribers
+		for event_type in (EventType if types is None else types):
+			subscribers.setdefault(event_type, []).append(callback)
+
+	def unsubscribe(self, callback: Callable[[Event], Any]):
+		subscribers = self._parsing_state.subscribers
+		for event_type, callbacks in list(subscribers.items()):
+			callbacks = [cb for cb in callbacks if cb != callback]
+			if callbacks:
+				subscribers[event_type] = callbacks
+			else:
+				del subscribers[event_type]
+
+	@property
+	def line_regex(self):
+		"""
+		The regex splitting the method and message of a log line. Setting it
+		also sets the equivalent bytes regex used by `read_line_bytes()`.
+		"""
+		return self._line_regex
+
+	@line_regex.setter
+	def line_regex(self, regex):
+		self._line_regex = regex
+		if regex is tokens.POWERLOG_LINE_RE:
+			self._line_regex_bytes = tokens.POWERLOG_LINE_BYTES_RE
+		else:
+			self._line_regex_bytes = re.compile(
+				regex.pattern.encode("utf-8"), regex.flags & ~re.UNICODE
+			)
 
 	@property
 	def game_meta(self):
@@ -1033,6 +1314,33 @@ class LogParser:
 	def games(self):
 		return self._parsing_state.games
 
+	def checkpoint(self) -> bytes:
+		"""
+		Snapshot the complete state of the parser, including its games, the
+		blocks currently open, pending packets, handler state and `offset`.
+
+		Resume with `from_checkpoint()`, then `read_path(path, start=offset)`.
+		For a log that is still being written, pass `complete_lines=True` to
+		`read_path()`, so that `offset` never ends in the middle of a line.
+		Handlers added with `register_handler()` must be picklable.
+		"""
+		return pickle.dumps(self, pickle.HIGHEST_PROTOCOL)
+
+	@classmethod
+	def from_checkpoint(cls, data: bytes) -> "LogParser":
+		"""Restore a parser from a snapshot made by `checkpoint()`."""
+		parser = pickle.loads(data)
+		if not isinstance(parser, cls):
+			raise TypeError("Not a %s checkpoint: %r" % (cls.__name__, type(parser)))
+		return parser
+
+	def tag_cache_info(self):
+		"""
+		Return hit/miss statistics of the tag resolution cache, as a
+		functools `CacheInfo(hits, misses, maxsize, currsize)` tuple.
+		"""
+		return self._parsing_state.parse_tag.cache_info()
+
 	def handle_entity_choices(self, ts, data):
 		return self._choices_handler.handle_entity_choices(self._parsing_state, ts, data)
 
@@ -1049,7 +1357,7 @@ class LogParser:
 		if self._last_ts is not None and self._last_ts[0] == ts:
 			return self._last_ts[1]
 
-		ret = parse_time(ts)
+		ret = parse_powerlog_time(ts)
 
 		if not self._synced_timestamp:
 
@@ -1077,8 +1385,7 @@ class LogParser:
 
 			return ret
 
-		ret = datetime.combine(self._current_date, ret)
-		ret = ret.replace(tzinfo=self._current_date.tzinfo)
+		ret = datetime.combine(self._current_date, ret, self._current_date.tzinfo)
 
 		if ret < self._current_date:
 
@@ -1099,6 +1406,51 @@ class LogParser:
 		for line in fp:
 			self.read_line(line)
 
+	def read_bytes(self, fp):
+		"""
+		Read a Power.log from a binary file object.
+		See `read_line_bytes()`.
+		"""
+		for line in fp:
+			self.read_line_bytes(line)
+
+	def read_path(
+		self, path, start: int = 0, end: Optional[int] = None, complete_lines: bool = False
+	):
+		"""
+		Read the Power.log at `path`.
+		The file is memory-mapped and its lines are fed to `read_line_bytes()`
+		straight from the page cache, without a buffered file object.
+
+		`start` and `end` restrict reading to a byte range of the file, which
+		should begin and end on line boundaries (see `scan.find_game_ranges()`).
+		Afterwards, `offset` is the position in the file up to which it was read.
+
+		If `complete_lines` is set, reading stops after the last line ending
+		with a line break. Use this for logs that are still being written, as
+		their last line may not be complete yet: `offset` is then the start of
+		that line, where reading can be resumed once it is (see `checkpoint()`).
+		"""
+		self.offset = start
+		with open(path, "rb") as f:
+			size = os.fstat(f.fileno()).st_size
+			if start >= size:
+				return
+			with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+				if end is None or end > size:
+					end = size
+				if complete_lines:
+					end = mm.rfind(b"\n", start, end) + 1
+				if start >= end:
+					return
+				mm.seek(start)
+				if end == size:
+					for line in iter(mm.readline, b""):
+						self.read_line_bytes(line)
+				else:
+					while mm.tell() < end:
+						self.read_line_bytes(mm.readline())
+
 	def read_line(self, line):
 		sre = tokens.TIMESTAMP_RE.match(line)
 
@@ -1114,7 +1466,7 @@ class LogParser:
 				line
 			)
 
-		sre = self.line_regex.match(line)
+		sre = self._line_regex.match(line)
 
 		if not sre:
 			return
@@ -1128,21 +1480,67 @@ class LogParser:
 
 			return
 
-		for handler in self._power_handler, self._choices_handler, self._options_handler:
-			callback = handler.find_callback(method)
-			if callback:
-				ts = self.parse_timestamp(ts, method)
+		callback = self._callbacks.get(method)
+		if callback:
+			return self._run_callback(callback, ts, method, msg)
+
+	def read_line_bytes(self, line: bytes):
+		"""
+		Read a single undecoded line (bytes, or any bytes-like object).
+
+		The timestamp and method are tokenized on the raw bytes. Only the message
+		of lines routed to a handler is decoded (as UTF-8); everything else, such
+		as the PowerTaskList half of the log, is skipped without decoding.
+		Lines that are not in the usual format are decoded and passed to
+		`read_line()`.
+		"""
+		self.offset += len(line)
+		sre = tokens.TIMESTAMP_BYTES_RE.match(line)
+
+		if not sre or sre.group(3).startswith(tokens.SPECTATOR_MODE_TOKEN_BYTES):
+			return self.read_line(_decode_line(line))
+
+		level, ts, line = sre.groups()
+		sre = self._line_regex_bytes.match(line)
+
+		if not sre:
+			return
+
+		method, msg = sre.groups()
+		callback = self._callbacks_bytes.get(method)
+
+		if not callback:
+			return
+
+		if not self._parsing_state.current_block and b"CREATE_GAME" not in msg:
+
+			# Ignore messages before the first CREATE_GAME packet
+
+			return
+
+		return self._run_callback(
+			callback, ts.decode("ascii"), method.decode("ascii"), _decode_line(msg).strip()
+		)
+
+	def _run_callback(self, callback, ts, method, msg):
+		ts = self.parse_timestamp(ts, method)
 
-				try:
-					return callback(self._parsing_state, ts, msg)
-				except NoSuchEnum as nse:
-					if nse.enum == GameTag and nse.value == "EOE":
+		ps = self._parsing_state
+		ret = None
+		try:
+			ret = callback(ps, ts, msg)
+		except NoSuchEnum as nse:
+			if nse.enum == GameTag and nse.value == "EOE":
 
-						# This can happen if the user is using a version of the
-						# HearthstoneAccess mod that hasn't been fully synchronized with the
-						# latest Hearthstone enums. `EOE` appears to be a HearthstoneAccess
-						# signal value indicating "end of enum."
+				# This can happen if the user is using a version of the
+				# HearthstoneAccess mod that hasn't been fully synchronized with the
+				# latest Hearthstone enums. `EOE` appears to be a HearthstoneAccess
+				# signal value indicating "end of enum."
 
-						pass
-					else:
-						raise
+				pass
+			else:
+				raise
+
+		if ps.subscribers:
+			ps.emit_resolved_players(ts)
+		return ret
@@ -0,0 +1,151 @@
+"""
+Single-pass parsing and exporting.
+
+	pipeline = ExportPipeline(parser, [EntityTreeExporter])
+	parser.read_path("Power.log")
+	parser.flush()
+	game = pipeline.results[0][0].game
+"""
+from typing import Any, Callable, List, Optional, Sequence
+
+from .events import BLOCK_TYPES, OPEN_PACKET_TYPES
+from .export import BaseExporter, EntityTreeExporter
+from .packets import CreateGame, Packet, PacketTree
+from .parser import LogParser
+from .player import coerce_to_entity_id
+
+
+DEFAULT_MAX_DEFERRED = 1000
+
+
+class ExportPipeline:
+	def __init__(
+		self,
+		parser: LogParser,
+		exporters: Sequence[Callable[[PacketTree], BaseExporter]],
+		on_game: Optional[Callable[[PacketTree, List[BaseExporter]], Any]] = None,
+		max_deferred: Optional[int] = DEFAULT_MAX_DEFERRED,
+	):
+		"""
+		Export the games parsed by `parser` while they are being parsed.
+
+		For each game, an exporter is created from each of `exporters`: an
+		exporter class (EntityTreeExporter subclasses are given the parser's
+		player manager) or any callable taking the PacketTree, e.g. to build a
+		CompositeExporter. Each top-level packet is passed to `export_packet()`
+		as soon as it is final, then removed from the PacketTree, so that only
+		the packet being parsed is kept in memory; `flush()` is called at the
+		end of the game. Exporters which do their work in an overridden
+		`export()` can't be used.
+
+		Until the names and ids of all the players of a game are known, packets
+		are held back, as exporters may look players up while handling them.
+		Once `max_deferred` packets are held back, they are exported anyway
+		(so that games whose players are never resolved don't stay in memory),
+		and exporters may then see players without a name.
+
+		The exporters of each game are appended to `results` and passed to
+		`on_game(packet_tree, exporters)`.
+
+		The parser hands the packets over directly (see ParsingState.packet_sink),
+		which costs less than subscribing to its events. Parsing and exporting
+		still run one after the other for each packet, so this takes about as
+		long as parsing, then exporting the complete tree: the gain is memory,
+		not time.
+		"""
+		ps = parser._parsing_state
+		if ps.columnar:
+			raise ValueError("Columnar packet trees can't be exported while parsing")
+		if ps.packet_sink is not None:
+			raise ValueError("The parser already hands its packets to %r" % ps.packet_sink)
+
+		self.parser = parser
+		self.exporter_factories = exporters
+		self.on_game = on_game
+		self.max_deferred = max_deferred
+		self.results: List[List[BaseExporter]] = []
+		self.exporters: List[BaseExporter] = []
+		self._export_packet: List[Callable[[Packet], Any]] = []
+		self._deferred: Optional[List[Packet]] = None
+		self._player_ids: List[int] = []
+		ps.packet_sink = self
+
+	def close(self):
+		ps = self.parser._parsing_state
+		if ps.packet_sink is self:
+			ps.packet_sink = None
+
+	def _create_exporter(self, factory, packet_tree: PacketTree) -> BaseExporter:
+		if isinstance(factory, type) and issubclass(factory, EntityTreeExporter):
+			return factory(packet_tree, player_manager=self.parser.player_manager)
+		return factory(packet_tree)
+
+	def _players_resolved(self) -> bool:
+		manager = self.parser.player_manager
+		return bool(self._player_ids) and all(
+			manager.is_entity_resolved(entity_id) for entity_id in self._player_ids
+		)
+
+	def _export(self, packet: Packet):
+		for export_packet in self._export_packet:
+			export_packet(packet)
+
+	def _handle_packet(self, packet: Packet):
+		if self._deferred is None:
+			self._export(packet)
+			return
+
+		if isinstance(packet, CreateGame):
+			self._player_ids = [coerce_to_entity_id(p.entity) for p in packet.players]
+		self._deferred.append(packet)
+		if self._players_resolved() or (
+			self.max_deferred is not None and len(self._deferred) >= self.max_deferred
+		):
+			self._export_deferred()
+
+	def _export_deferred(self):
+		deferred = self._deferred
+		self._deferred = None
+		for packet in deferred:
+			self._export(packet)
+
+	def _release_packets(self, packet_tree: PacketTree, count: int):
+		packets = packet_tree.packets
+		for i in range(count):
+			self._handle_packet(packets[i])
+		del packets[:count]
+
+	# Packet sink
+
+	def game_start(self, packet_tree: PacketTree):
+		# The index would keep the released packets alive
+		packet_tree.packet_index = None
+		self.exporters = [
+			self._create_exporter(factory, packet_tree) for factory in self.exporter_factories
+		]
+		self._export_packet = [exporter.export_packet for exporter in self.exporters]
+		self._deferred = []
+		self._player_ids = []
+
+	def packet(self, packet_tree: PacketTree, packet: Packet):
+		# The parser has moved on to a new top-level packet, so the ones before
+		# it are final. So is the new one, unless the next lines may fill it in.
+		count = len(packet_tree.packets)
+		if isinstance(packet, BLOCK_TYPES) or isinstance(packet, OPEN_PACKET_TYPES):
+			count -= 1
+		if count:
+			self._release_packets(packet_tree, count)
+
+	def game_end(self, packet_tree: PacketTree):
+		self._release_packets(packet_tree, len(packet_tree.packets))
+		if self._deferred is not None:
+			self._export_deferred()
+		for exporter in self.exporters:
+			exporter.flush()
+
+		self.results.append(self.exporters)
+		if self.on_game is not None:
+			self.on_game(packet_tree, self.exporters)
+		games = self.parser._parsing_state.games
+		if packet_tree in games:
+			games.remove(packet_tree)
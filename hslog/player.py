@@ -97,6 +97,37 @@ class PlayerManager:
 	def get_player_by_player_id(self, player_id: int) -> Optional[PlayerReference]:
 		return self._players_by_player_id.get(player_id)
 
+	@property
+	def resolved_player_count(self) -> int:
+		return len(self._player_resolution_order)
+
+	def resolved_players(self) -> List[PlayerReference]:
+		"""
+		Return the players whose name, entity id and player id are all known,
+		in the order they were resolved.
+		"""
+		return [
+			self._players_by_player_id[player_id]
+			for player_id in self._player_resolution_order
+			if player_id in self._players_by_player_id
+		]
+
+	def is_entity_resolved(self, entity_id: int) -> bool:
+		"""Whether the name and player id of player entity \a entity_id are known."""
+		player = self._players_by_entity_id.get(entity_id)
+		return player is not None and player.player_id in self._player_resolution_order
+
+	def is_resolved(self, player: PlayerReference, name: str) -> bool:
+		"""
+		Whether \a player is the final reference for \a name, i.e. whether
+		create_or_update_player(name=name) would return it unchanged.
+		"""
+		return (
+			player.name == name and
+			self._players_by_name.get(name) is player and
+			player.player_id in self._player_resolution_order
+		)
+
 	def _guess_player_entity_id(self, name: str) -> Optional[PlayerReference]:
 		assert name, "Expected a name for get_player_by_name (got %r)" % name
 		if name not in self._players_by_name:
@@ -0,0 +1,220 @@
+"""
+Fast pre-passes over raw Power.log data which look for marker substrings
+instead of tokenizing every line.
+"""
+import mmap
+import os
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+
+from . import tokens
+from .parser import ParsingState, PowerHandler
+from .utils import parse_powerlog_time
+
+
+CREATE_GAME_MARKER = b"CREATE_GAME"
+_CREATE_GAME_METHOD = b"GameState.DebugPrintPower"
+_GAME_METHOD_PREFIX = b"GameState."
+_DEBUG_PRINT_GAME = b"GameState.DebugPrintGame()"
+_DEBUG_PRINT_GAME_METHOD = b"GameState.DebugPrintGame"
+_PLAYER_MARKER = b"Player EntityID="
+
+
+def _is_create_game(line: bytes) -> bool:
+	sre = tokens.TIMESTAMP_BYTES_RE.match(line)
+	if not sre:
+		return False
+	sre = tokens.POWERLOG_LINE_BYTES_RE.match(sre.group(3))
+	if not sre:
+		return False
+	method, msg = sre.groups()
+	return method == _CREATE_GAME_METHOD and msg.strip() == CREATE_GAME_MARKER
+
+
+def _is_leading_line(line: bytes) -> bool:
+	"""
+	Whether \\a line may precede a CREATE_GAME line as part of the same game:
+	spectator mode and DebugPrintGame lines, as well as lines that LogParser
+	ignores (such as PowerTaskList output).
+	"""
+	parts = line.split(None, 2)
+	if len(parts) < 3:
+		return not line.strip()
+	message = parts[2]
+	if message.startswith(tokens.SPECTATOR_MODE_TOKEN_BYTES):
+		return True
+	if message.startswith(_GAME_METHOD_PREFIX):
+		return message.startswith(_DEBUG_PRINT_GAME)
+	return True
+
+
+def _find_game_start(buf, line_start: int, lower_bound: int) -> int:
+	start = line_start
+	while start > lower_bound:
+		previous = buf.rfind(b"\n", lower_bound, start - 1) + 1
+		if previous < lower_bound:
+			previous = lower_bound
+		if not _is_leading_line(buf[previous:start]):
+			break
+		start = previous
+	return start
+
+
+def find_game_ranges(buf) -> List[Tuple[int, int]]:
+	"""
+	Split the Power.log data in \\a buf (bytes or a mmap) into games.
+	Returns a list of (start, end) byte offsets, one per CREATE_GAME.
+
+	A game's range begins with the spectator mode and DebugPrintGame lines
+	directly preceding its CREATE_GAME line and extends to the start of the
+	next game (or the end of \\a buf). Each range can be read on its own by a
+	fresh LogParser, e.g. with `LogParser.read_path(path, start, end)`.
+	Data before the first game is not part of any range.
+	"""
+	starts = []
+	previous_end = 0
+	pos = buf.find(CREATE_GAME_MARKER)
+	while pos != -1:
+		line_start = buf.rfind(b"\n", 0, pos) + 1
+		line_end = buf.find(b"\n", pos)
+		if line_end == -1:
+			line_end = len(buf)
+		else:
+			line_end += 1
+
+		if _is_create_game(buf[line_start:line_end]):
+			starts.append(_find_game_start(buf, line_start, previous_end))
+			previous_end = line_end
+
+		pos = buf.find(CREATE_GAME_MARKER, line_end)
+
+	return list(zip(starts, starts[1:] + [len(buf)]))
+
+
+class PlayerMetadata(NamedTuple):
+	player_id: int
+	entity_id: int
+	name: Optional[str]
+	hi: int
+	lo: int
+
+
+class GameMetadata(NamedTuple):
+	# Byte range of the game, see find_game_ranges()
+	start: int
+	end: int
+	# Timestamps (without date) of the CREATE_GAME line and of the last line
+	start_time: Any
+	end_time: Any
+	# The values of the DebugPrintGame lines (BuildNumber, GameType...)
+	game_meta: Dict[str, Any]
+	players: List[PlayerMetadata]
+
+
+def _parse_line(line: bytes) -> Optional[Tuple[str, bytes, str]]:
+	sre = tokens.TIMESTAMP_BYTES_RE.match(line)
+	if not sre:
+		return None
+	ts = sre.group(2)
+	sre = tokens.POWERLOG_LINE_BYTES_RE.match(sre.group(3))
+	if not sre:
+		return None
+	method, msg = sre.groups()
+	return ts.decode("ascii"), method, msg.decode("utf-8", "replace").strip()
+
+
+def _line_at(buf, pos: int, start: int, end: int) -> bytes:
+	line_start = buf.rfind(b"\n", start, pos) + 1 or start
+	line_end = buf.find(b"\n", pos, end)
+	if line_end == -1:
+		line_end = end
+	return buf[max(line_start, start):line_end]
+
+
+def _find_lines(buf, marker: bytes, start: int, end: int) -> List[Tuple[int, bytes]]:
+	ret = []
+	pos = buf.find(marker, start, end)
+	while pos != -1:
+		ret.append((pos, _line_at(buf, pos, start, end)))
+		pos = buf.find(b"\n", pos, end)
+		if pos == -1:
+			break
+		pos = buf.find(marker, pos, end)
+	return ret
+
+
+def _last_timestamp(buf, start: int, end: int):
+	line_end = end
+	while line_end > start:
+		line_start = buf.rfind(b"\n", start, line_end - 1) + 1 or start
+		sre = tokens.TIMESTAMP_BYTES_RE.match(buf[max(line_start, start):line_end])
+		if sre:
+			return parse_powerlog_time(sre.group(2).decode("ascii"))
+		line_end = line_start
+
+
+def _scan_game(buf, start: int, end: int) -> GameMetadata:
+	ps = ParsingState()
+	start_time = None
+	players: Dict[int, Tuple[int, int, int]] = {}
+
+	lines = sorted(
+		_find_lines(buf, _DEBUG_PRINT_GAME, start, end) +
+		_find_lines(buf, _PLAYER_MARKER, start, end) +
+		_find_lines(buf, CREATE_GAME_MARKER, start, end)
+	)
+	for _, line in lines:
+		parsed = _parse_line(line)
+		if parsed is None:
+			continue
+		ts, method, msg = parsed
+		if method == _DEBUG_PRINT_GAME_METHOD:
+			PowerHandler.handle_game(ps, ts, msg)
+		elif method != _CREATE_GAME_METHOD:
+			continue
+		elif msg == "CREATE_GAME":
+			if start_time is None:
+				start_time = parse_powerlog_time(ts)
+		else:
+			sre = tokens.PLAYER_ENTITY_RE.match(msg)
+			if sre:
+				# As in ParsingState.register_player(), without creating packets
+				entity_id, player_id, hi, lo = map(int, sre.groups())
+				ps.manager.create_or_update_player(
+					entity_id=entity_id, player_id=player_id, is_ai=lo == 0
+				)
+				players[player_id] = (entity_id, hi, lo)
+
+	return GameMetadata(
+		start=start,
+		end=end,
+		start_time=start_time,
+		end_time=_last_timestamp(buf, start, end),
+		game_meta=ps.game_meta,
+		players=[
+			PlayerMetadata(
+				player_id, entity_id, ps.manager.get_player_by_player_id(player_id).name, hi, lo
+			)
+			for player_id, (entity_id, hi, lo) in players.items()
+		],
+	)
+
+
+def scan_metadata(buf) -> List[GameMetadata]:
+	"""
+	Collect the metadata of each game in the Power.log data \a buf (bytes or
+	a mmap): its DebugPrintGame values, players and start and end times.
+
+	Only the lines containing CREATE_GAME, DebugPrintGame and player entity
+	markers are tokenized; no tags are parsed and no packets are created.
+	Player names are those announced by DebugPrintGame lines: names which a
+	full parse would only learn later from tag changes or mulligans are None.
+	"""
+	return [_scan_game(buf, start, end) for start, end in find_game_ranges(buf)]
+
+
+def scan_metadata_path(path: str) -> List[GameMetadata]:
+	with open(path, "rb") as f:
+		if not os.fstat(f.fileno()).st_size:
+			return []
+		with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+			return scan_metadata(mm)
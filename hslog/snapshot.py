@@ -0,0 +1,83 @@
+"""
+Compact copies of the state of a hearthstone Game and all of its entities,
+see EntityTreeExporter.state_at().
+"""
+import sys
+from typing import Any, Dict, NamedTuple, Tuple
+
+from hearthstone.entities import Entity, Game
+
+
+class _EntityRefs(NamedTuple):
+	"""A list, or the values of a dict, of entities, stored as entity ids."""
+	container: type
+	ids: tuple
+
+
+class GameSnapshot(NamedTuple):
+	# The state before the packet `packet_id`, the top-level packet `index`
+	packet_id: int
+	index: int
+	# (entity class, attributes) of each entity, the game first
+	entities: Tuple[Tuple[type, Dict[str, Any]], ...]
+	# Approximate size in bytes
+	size: int
+
+
+def _copy_attribute(value):
+	if isinstance(value, Entity):
+		return _EntityRefs(Entity, (value.id, ))
+	container = type(value)
+	if container is list:
+		if value and isinstance(value[0], Entity):
+			return _EntityRefs(list, tuple(entity.id for entity in value))
+		return list(value)
+	if container is dict:
+		if value and isinstance(next(iter(value.values())), Entity):
+			return _EntityRefs(dict, tuple((key, entity.id) for key, entity in value.items()))
+		return dict(value)
+	if container is set:
+		return set(value)
+	return value
+
+
+def take_snapshot(game: Game, packet_id: int, index: int) -> GameSnapshot:
+	entities = []
+	size = 0
+	for entity in [game] + [e for e in game.entities if e is not game]:
+		state = {
+			key: _copy_attribute(value) for key, value in vars(entity).items() if key != "game"
+		}
+		size += sys.getsizeof(state) + sum(map(sys.getsizeof, state.values()))
+		entities.append((entity.__class__, state))
+	return GameSnapshot(packet_id, index, tuple(entities), size)
+
+
+def _restore_attribute(value, entities):
+	if type(value) is _EntityRefs:
+		if value.container is Entity:
+			return entities[value.ids[0]]
+		if value.container is list:
+			return [entities[entity_id] for entity_id in value.ids]
+		return {key: entities[entity_id] for key, entity_id in value.ids}
+	container = type(value)
+	if container in (list, dict, set):
+		return container(value)
+	return value
+
+
+def restore_snapshot(snapshot: GameSnapshot) -> Game:
+	"""Return a new Game with the state recorded in \a snapshot."""
+	entities = {}
+	for cls, state in snapshot.entities:
+		entity = cls.__new__(cls)
+		entities[state["id"]] = entity
+
+	game = entities[snapshot.entities[0][1]["id"]]
+	for cls, state in snapshot.entities:
+		entity = entities[state["id"]]
+		entity.__dict__.update(
+			(key, _restore_attribute(value, entities)) for key, value in state.items()
+		)
+		entity.game = game
+	return game
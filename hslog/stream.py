@@ -0,0 +1,96 @@
+"""
+Streaming consumption of parsed games, with bounded memory.
+
+	stream = PacketStream(parser, on_packet=handle_packet, on_game=handle_game)
+	parser.read_path("Power.log")
+	parser.flush()
+"""
+from typing import Any, Callable, Optional, Set
+
+from .events import Event, EventType
+from .packets import Packet, PacketTree
+from .parser import LogParser
+
+
+class PacketStream:
+	def __init__(
+		self,
+		parser: LogParser,
+		on_packet: Optional[Callable[[PacketTree, Packet], Any]] = None,
+		on_game: Optional[Callable[[PacketTree], Any]] = None,
+		on_game_start: Optional[Callable[[PacketTree], Any]] = None,
+	):
+		"""
+		Hand the games parsed by `parser` to consumers, then release them.
+
+		`on_packet(packet_tree, packet)` is called for each top-level packet of
+		a game (a Block with all of its content) once it is final, in order.
+		The packet is then removed from `packet_tree.packets`, so that only
+		the deepest open block is kept in memory.
+
+		`on_game(packet_tree)` is called for each finished game (see
+		EventType.GAME_END), which is then removed from `parser.games`.
+		Without `on_packet`, the game is handed over with all of its packets.
+		"""
+		if parser._parsing_state.columnar:
+			raise ValueError("Columnar packet trees can't be streamed")
+
+		self.parser = parser
+		self.on_packet = on_packet
+		self.on_game = on_game
+		self.on_game_start = on_game_start
+		# Top-level packets not final yet, which hold back the packets after them
+		self._open: Set[Packet] = set()
+		parser.subscribe(self._handle_event, (
+			EventType.PACKET, EventType.PACKET_FINAL, EventType.BLOCK_END,
+			EventType.GAME_START, EventType.GAME_END,
+		))
+
+	def close(self):
+		self.parser.unsubscribe(self._handle_event)
+		self._open.clear()
+
+	def _release_packets(self, packet_tree: PacketTree):
+		packets = packet_tree.packets
+		count = 0
+		for packet in packets:
+			if packet in self._open:
+				break
+			self.on_packet(packet_tree, packet)
+			count += 1
+		if count:
+			del packets[:count]
+
+	def _handle_event(self, event: Event):
+		event_type = event.type
+		if event_type == EventType.PACKET:
+			if self.on_packet is None:
+				return
+			packet_tree = self.parser._parsing_state.packet_tree
+			packets = packet_tree.packets
+			if not packets or packets[-1] is not event.data:
+				# Not a top-level packet
+				return
+			if not event.final:
+				self._open.add(event.data)
+			else:
+				self._release_packets(packet_tree)
+		elif event_type in (EventType.PACKET_FINAL, EventType.BLOCK_END):
+			if event.data in self._open:
+				self._open.discard(event.data)
+				self._release_packets(self.parser._parsing_state.packet_tree)
+		elif event_type == EventType.GAME_START:
+			# The index would keep the released packets alive
+			event.data.packet_index = None
+			if self.on_game_start is not None:
+				self.on_game_start(event.data)
+		elif event_type == EventType.GAME_END:
+			packet_tree = event.data
+			if self.on_packet is not None:
+				self._open.clear()
+				self._release_packets(packet_tree)
+			if self.on_game is not None:
+				self.on_game(packet_tree)
+			games = self.parser._parsing_state.games
+			if packet_tree in games:
+				games.remove(packet_tree)
@@ -11,6 +11,8 @@ ENTITY_RE = re.compile(r"\[.*\s*id=(\d+)\s*.*\]")
 TIMESTAMP_POWERLOG_FORMAT = r"%H:%M:%S.%f"
 TIMESTAMP_RE = re.compile(r"^([DWE]) ([\d:.]+) (.+)$")
 POWERLOG_LINE_RE = re.compile(r"([^(]+)\(\) - (.+)$")
+TIMESTAMP_BYTES_RE = re.compile(TIMESTAMP_RE.pattern.encode())
+POWERLOG_LINE_BYTES_RE = re.compile(POWERLOG_LINE_RE.pattern.encode())
 
 # Game / Player
 GAME_ENTITY_RE = re.compile(r"GameEntity EntityID=(\d+)")
@@ -69,6 +71,7 @@ SEND_OPTION_RE = re.compile(r"selectedOption=(\d+) selectedSubOption=(-1|\d+) se
 
 # Spectator mode
 SPECTATOR_MODE_TOKEN = "=================="
+SPECTATOR_MODE_TOKEN_BYTES = SPECTATOR_MODE_TOKEN.encode()
 SPECTATOR_MODE_BEGIN_GAME = "Start Spectator Game"
 SPECTATOR_MODE_BEGIN_FIRST = "Begin Spectating 1st player"
 SPECTATOR_MODE_BEGIN_SECOND = "Begin Spectating 2nd player"
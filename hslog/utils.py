@@ -1,3 +1,6 @@
+from datetime import time
+
+from aniso8601 import parse_time
 from hearthstone.enums import TAG_TYPES, GameTag, GameType
 
 from hslog.exceptions import NoSuchEnum
@@ -24,6 +27,24 @@ def parse_tag(tag, value):
 	return tag, value
 
 
+def parse_powerlog_time(ts: str) -> time:
+	"""
+	Parse a Power.log timestamp (tokens.TIMESTAMP_POWERLOG_FORMAT).
+	The fixed HH:MM:SS.fffffff layout is decoded directly; fractional seconds
+	beyond microseconds are truncated. Anything else is left to aniso8601.
+	"""
+	if len(ts) > 9 and ts[2] == ":" and ts[5] == ":" and ts[8] == ".":
+		digits = ts[:2] + ts[3:5] + ts[6:8] + ts[9:]
+		if digits.isascii() and digits.isdigit():
+			try:
+				return time(
+					int(ts[:2]), int(ts[3:5]), int(ts[6:8]), int(ts[9:15].ljust(6, "0"))
+				)
+			except ValueError:
+				pass
+	return parse_time(ts)
+
+
 def is_mercenaries_game_type(game_type: GameType):
 	return game_type in (
 		GameType.GT_MERCENARIES_AI_VS_AI,
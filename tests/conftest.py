@@ -1,5 +1,6 @@
 import os
 import subprocess
+from io import StringIO
 
 import pytest
 
@@ -10,6 +11,10 @@ BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 LOG_DATA_DIR = os.path.join(BASE_DIR, "logdata")
 LOG_DATA_GIT = "https://github.com/HearthSim/hsreplay-test-data"
 
+PACKET_ATTRIBUTES = (
+	"ts", "packet_id", "entity", "tag", "value", "card_id", "tags", "type", "id", "choices"
+)
+
 
 def pytest_addoption(parser):
 	parser.addoption(
@@ -36,6 +41,32 @@ def logfile(path):
 	return os.path.join(LOG_DATA_DIR, "hslog-tests", path)
 
 
+def parse(*logs, parser=None, current_date=None, **kwargs):
+	"""
+	Read \a logs into \a parser (a new LogParser created with \a kwargs if not given)
+	and return it, flushed.
+	"""
+	if parser is None:
+		parser = LogParser(**kwargs)
+	if current_date is not None:
+		parser._current_date = current_date
+	for log in logs:
+		parser.read(StringIO(log))
+	parser.flush()
+	return parser
+
+
+def packet_signature_of(packets):
+	return [
+		(type(packet).__name__, [getattr(packet, attr, None) for attr in PACKET_ATTRIBUTES])
+		for packet in packets
+	]
+
+
+def packet_signature(packet_tree):
+	return packet_signature_of(packet_tree.recursive_iter())
+
+
 @pytest.fixture
 def parser():
 	return LogParser()
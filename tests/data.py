@@ -271,3 +271,13 @@ D 13:24:38.7829954 GameState.DebugPrintPower() -                 tag=SPAWN_TIME_
 D 13:24:38.7829954 GameState.DebugPrintPower() -                 tag=COPIED_FROM_ENTITY_ID value=9531
 D 13:24:38.7829954 GameState.DebugPrintPower() -                 tag=1596 value=1
 """.strip()
+
+
+MIXED_GAME = "\n".join((
+	INITIAL_GAME,
+	FULL_ENTITY,
+	CONTROLLER_CHANGE,
+	OPTIONS_WITH_ERRORS,
+	SUB_SPELL_BLOCK,
+	SHUFFLE_DECK,
+))
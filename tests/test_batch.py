@@ -0,0 +1,61 @@
+import pickle
+
+from hearthstone.enums import GameTag
+
+from hslog.batch import parse_many, parse_path
+from hslog.exceptions import CorruptLogError, NoSuchEnum
+from hslog.export import EntityTreeExporter, FriendlyPlayerExporter
+
+from . import data
+
+
+def entity_count(exporter):
+	return len(exporter.game._entities)
+
+
+def write_log(tmp_path, name, content):
+	path = tmp_path / name
+	path.write_bytes(content)
+	return str(path)
+
+
+def test_parse_many(tmp_path):
+	game = (data.INITIAL_GAME + "\n" + data.FULL_ENTITY + "\n").encode("utf-8")
+	paths = [
+		write_log(tmp_path, "one.log", game),
+		write_log(tmp_path, "two.log", game * 2),
+		write_log(tmp_path, "corrupt.log", game + (
+			b"D 02:59:14.6500380 GameState.DebugPrintPower() - TAG_CHANGE Entity=\xff\n"
+		)),
+		write_log(tmp_path, "empty.log", b""),
+	]
+
+	results = list(parse_many(paths, EntityTreeExporter, workers=2, collect=entity_count))
+
+	assert [result.path for result in results] == paths
+	assert results[0].results == [4]
+	assert results[1].results == [4, 4]
+	assert results[1].error is None
+	assert results[2].results == []
+	assert isinstance(results[2].error, CorruptLogError)
+	assert results[3].results == []
+	assert results[3].error is None
+
+
+def test_parse_path_default_collect(tmp_path):
+	path = write_log(tmp_path, "Power.log", data.INITIAL_GAME.encode("utf-8"))
+
+	result = parse_path(path, EntityTreeExporter)
+	exporter = result.results[0]
+	assert exporter.packet_tree is None
+	assert len(exporter.game.players) == 2
+
+	result = parse_path(path, FriendlyPlayerExporter)
+	assert result.results == [2]
+
+
+def test_pickle_no_such_enum():
+	error = pickle.loads(pickle.dumps(NoSuchEnum(GameTag, "EOE")))
+	assert error.enum is GameTag
+	assert error.value == "EOE"
+	assert str(error) == str(NoSuchEnum(GameTag, "EOE"))
@@ -0,0 +1,129 @@
+import os
+from io import BytesIO, StringIO
+
+from hslog import LogParser
+from hslog.cache import ENTRY_SUFFIX, ParseCache
+from hslog.export import EntityTreeExporter
+
+from . import data
+from .conftest import packet_signature
+
+
+LOG = "\n".join((data.INITIAL_GAME, data.FULL_ENTITY, data.CONTROLLER_CHANGE))
+
+
+def entries(cache):
+	return sorted(name for name in os.listdir(cache.directory) if name.endswith(ENTRY_SUFFIX))
+
+
+def test_cache_hit(tmp_path):
+	cache = ParseCache(str(tmp_path))
+
+	parser = LogParser()
+	cache.read(parser, StringIO(LOG))
+	assert (cache.hits, cache.misses) == (0, 1)
+
+	cached_parser = LogParser()
+	cache.read(cached_parser, BytesIO(LOG.encode("utf-8")))
+	assert (cache.hits, cache.misses) == (1, 1)
+
+	assert len(cached_parser.games) == 1
+	assert packet_signature(cached_parser.games[0]) == packet_signature(parser.games[0])
+	assert cached_parser.game_meta == parser.game_meta
+	assert cached_parser.player_manager is not parser.player_manager
+
+	exporter = EntityTreeExporter(
+		cached_parser.games[0], player_manager=cached_parser.player_manager
+	)
+	assert exporter.export().game is not None
+
+
+def test_cache_hit_parsing_state(tmp_path):
+	cache = ParseCache(str(tmp_path))
+	parser = LogParser()
+	cache.read(parser, StringIO(LOG))
+
+	cached_parser = LogParser()
+	cache.read(cached_parser, StringIO(LOG))
+	assert cache.hits == 1
+
+	state = cached_parser._parsing_state
+	assert state.packet_tree is cached_parser.games[0]
+	assert type(state.current_block) is type(parser._parsing_state.current_block)
+
+	# The game can be continued as after parsing
+	for p in (parser, cached_parser):
+		p.read(StringIO(data.CONTROLLER_CHANGE))
+		p.flush()
+	assert packet_signature(cached_parser.games[0]) == packet_signature(parser.games[0])
+
+
+def test_cache_subscribers(tmp_path):
+	cache = ParseCache(str(tmp_path))
+	cache.read(LogParser(), StringIO(LOG))
+
+	# A cache hit would emit no events
+	parser = LogParser()
+	events = []
+	parser.subscribe(events.append)
+	cache.read(parser, StringIO(LOG))
+	assert cache.hits == 0
+	assert events
+
+
+def test_cache_key(tmp_path):
+	cache = ParseCache(str(tmp_path))
+	data = LOG.encode("utf-8")
+
+	assert cache.key(LogParser(), data) == cache.key(LogParser(), data)
+	assert cache.key(LogParser(), data) != cache.key(LogParser(), data + b"\n")
+	assert cache.key(LogParser(), data) != cache.key(LogParser(columnar=True), data)
+
+
+def test_cache_used_parser(tmp_path):
+	cache = ParseCache(str(tmp_path))
+	cache.read(LogParser(), StringIO(LOG))
+
+	# Parsers which already hold games bypass the cache
+	parser = LogParser()
+	parser.read(StringIO(LOG))
+	cache.read(parser, StringIO(LOG))
+	assert cache.hits == 0
+	assert len(parser.games) == 2
+
+
+def test_cache_corrupt_entry(tmp_path):
+	cache = ParseCache(str(tmp_path))
+	cache.read(LogParser(), StringIO(LOG))
+	name, = entries(cache)
+	with open(os.path.join(cache.directory, name), "wb") as f:
+		f.write(b"garbage")
+
+	parser = LogParser()
+	cache.read(parser, StringIO(LOG))
+	assert (cache.hits, cache.misses) == (0, 2)
+	assert len(parser.games) == 1
+
+
+def test_cache_eviction(tmp_path):
+	cache = ParseCache(str(tmp_path))
+	logs = [LOG, LOG + "\n" + data.OPTIONS_WITH_ERRORS, data.INITIAL_GAME]
+
+	for log in logs[:2]:
+		cache.read(LogParser(), StringIO(log))
+	first, second = (cache._path(cache.key(LogParser(), log.encode())) for log in logs[:2])
+	os.utime(first, (1000, 1000))
+	os.utime(second, (2000, 2000))
+
+	# A hit marks the first entry as recently used
+	cache.read(LogParser(), StringIO(logs[0]))
+	assert cache.hits == 1
+
+	cache.max_size = os.path.getsize(first) + os.path.getsize(second) - 1
+	cache.read(LogParser(), StringIO(logs[2]))
+	assert len(entries(cache)) == 2
+	assert os.path.exists(first)
+	assert not os.path.exists(second)
+
+	cache.clear()
+	assert entries(cache) == []
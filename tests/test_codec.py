@@ -0,0 +1,128 @@
+import random
+from io import BytesIO
+
+import pytest
+from aniso8601 import parse_datetime
+
+from hslog import codec, packets
+from hslog.events import EventType
+from hslog.exceptions import CodecError
+from hslog.player import PlayerReference
+
+from . import conftest, data
+from .conftest import packet_signature
+
+
+def parse(columnar=False, current_date=None):
+	return conftest.parse(
+		data.MIXED_GAME, columnar=columnar, current_date=current_date
+	).games[0]
+
+
+def check_parents(packet_tree, parent):
+	for packet in packet_tree.packets:
+		if isinstance(packet, (packets.Block, packets.SubSpell)):
+			assert packet.parent is parent
+			check_parents(packet, packet)
+
+
+@pytest.mark.parametrize("columnar", [False, True])
+@pytest.mark.parametrize("current_date", [
+	None, parse_datetime("2015-01-01T02:58:00+0200")
+])
+def test_round_trip(columnar, current_date):
+	packet_tree = parse(columnar, current_date)
+	restored = codec.loads(codec.dumps(packet_tree))
+
+	assert packet_signature(restored) == packet_signature(packet_tree)
+	assert restored.columnar == columnar
+	assert restored.packet_counter == packet_tree.packet_counter
+	assert restored.spectator_mode == packet_tree.spectator_mode
+	assert [packet.ts for packet in restored.recursive_iter()] == [
+		packet.ts for packet in packet_tree.recursive_iter()
+	]
+	check_parents(restored, restored)
+
+	# Packets without a packet_id (eg. Options) stay without one
+	options = list(restored.recursive_iter(packets.Options))
+	assert options
+	assert not any(hasattr(packet, "packet_id") for packet in options)
+
+
+def test_player_references():
+	packet_tree = conftest.parse(
+		data.INITIAL_GAME,
+		"D 00:35:37.6421200 GameState.DebugPrintPower() - TAG_CHANGE Entity=BehEh#1355 tag=MULLIGAN_STATE value=DONE\n"  # noqa
+		"D 00:35:37.6421200 GameState.DebugPrintPower() - TAG_CHANGE Entity=BehEh#1355 tag=MULLIGAN_STATE value=DONE\n"  # noqa
+	).games[0]
+	restored = codec.loads(codec.dumps(packet_tree))
+
+	def players(packet_tree):
+		return [
+			packet.entity for packet in packet_tree.recursive_iter(packets.TagChange)
+			if isinstance(packet.entity, PlayerReference)
+		]
+
+	original = players(packet_tree)
+	assert original
+	assert players(restored) == original
+	assert len({id(player) for player in players(restored)}) == (
+		len({id(player) for player in original})
+	)
+
+
+def test_dump_load():
+	packet_tree = parse()
+	fp = BytesIO()
+	codec.dump(packet_tree, fp)
+	fp.seek(0)
+	assert packet_signature(codec.load(fp)) == packet_signature(packet_tree)
+
+
+def test_invalid_data():
+	data = codec.dumps(parse())
+
+	with pytest.raises(CodecError):
+		codec.loads(b"XXXX" + data[4:])
+
+	with pytest.raises(CodecError):
+		codec.loads(codec.MAGIC + bytes((codec.CODEC_VERSION + 1, )) + data[5:])
+
+	with pytest.raises(CodecError):
+		codec.loads(data[:len(data) // 2])
+
+
+def test_corrupt_data():
+	data = codec.dumps(parse(True, parse_datetime("2015-01-01T02:58:00+0200")))
+	rng = random.Random(0)
+
+	for _ in range(500):
+		corrupt = bytearray(data)
+		for _ in range(rng.randint(1, 4)):
+			corrupt[rng.randrange(len(codec.MAGIC) + 1, len(corrupt))] = rng.randrange(256)
+		try:
+			codec.loads(bytes(corrupt))
+		except CodecError:
+			pass
+
+
+def test_enum_modules():
+	for name in (b"os:system", b"hearthstone.enums:GameTag.__class__"):
+		data = codec.MAGIC + bytes((
+			codec.CODEC_VERSION, codec.ENUM, codec.STR, len(name)
+		)) + name + bytes((0, ))
+		with pytest.raises(CodecError):
+			codec.loads(data)
+
+	with pytest.raises(CodecError):
+		codec.Encoder().write(EventType.GAME_START)
+
+
+def test_time_zone():
+	current_date = parse_datetime("2015-01-01T02:58:00+0200")
+	packet_tree = parse(True, current_date)
+	restored = codec.loads(codec.dumps(packet_tree))
+
+	timestamps = [packet.ts for packet in restored.recursive_iter()]
+	assert {ts.utcoffset() for ts in timestamps} == {current_date.utcoffset()}
+	assert len({id(ts.tzinfo) for ts in timestamps}) == 1
@@ -0,0 +1,107 @@
+from io import StringIO
+
+from hslog import LogParser, packets
+from hslog.events import EventType
+from hslog.player import PlayerReference
+
+from . import conftest, data
+
+
+def snapshot(packet):
+	"""Return the parts of \a packet the parser may fill in after creating it."""
+	return (
+		list(getattr(packet, "tags", ())),
+		list(getattr(packet, "packets", ())),
+		list(getattr(packet, "players", ())),
+		list(getattr(packet, "choices", ())),
+		list(getattr(packet, "options", ())),
+		list(getattr(packet, "info", ())),
+		getattr(packet, "entity", None),
+	)
+
+
+def parse(*logs):
+	parser = LogParser()
+	events = []
+	parser.subscribe(events.append)
+	return conftest.parse(*logs, parser=parser), events
+
+
+def test_packet_events():
+	parser, events = parse(data.MIXED_GAME)
+	packet_tree = parser.games[0]
+
+	assert events[0].type == EventType.GAME_START
+	assert events[0].data is packet_tree
+	assert events[-1].type == EventType.GAME_END
+	assert events[-1].data is packet_tree
+
+	emitted = [event.data for event in events if event.type == EventType.PACKET]
+	final = {}
+	for event in events:
+		if event.final and event.type in (EventType.PACKET, EventType.PACKET_FINAL):
+			assert id(event.data) not in final
+			final[id(event.data)] = snapshot(event.data)
+
+	# Every packet is emitted once, then marked final once it is complete
+	assert len({id(packet) for packet in emitted}) == len(emitted)
+	assert sorted(
+		packet.packet_id for packet in emitted if not isinstance(packet, packets.Options)
+	) == list(range(1, packet_tree.packet_counter + 1))
+	for packet in emitted:
+		assert final[id(packet)] == snapshot(packet)
+
+
+def test_block_events():
+	parser, events = parse(data.INITIAL_GAME, data.SUB_SPELL_BLOCK)
+
+	blocks = [
+		(event.type, type(event.data)) for event in events
+		if event.type in (EventType.BLOCK_START, EventType.BLOCK_END)
+	]
+	assert blocks == [
+		(EventType.BLOCK_START, packets.Block),
+		(EventType.BLOCK_START, packets.Block),
+		(EventType.BLOCK_START, packets.SubSpell),
+		(EventType.BLOCK_END, packets.SubSpell),
+		(EventType.BLOCK_END, packets.Block),
+	]
+
+
+def test_game_events():
+	parser, events = parse(data.INITIAL_GAME, data.INITIAL_GAME)
+
+	games = [
+		(event.type, event.data) for event in events
+		if event.type in (EventType.GAME_START, EventType.GAME_END)
+	]
+	assert games == [
+		(EventType.GAME_START, parser.games[0]),
+		(EventType.GAME_END, parser.games[0]),
+		(EventType.GAME_START, parser.games[1]),
+		(EventType.GAME_END, parser.games[1]),
+	]
+
+
+def test_player_resolved_events():
+	parser, events = parse(
+		data.INITIAL_GAME,
+		"D 00:35:10.5056220 GameState.DebugPrintGame() - PlayerID=1, PlayerName=Foo#1234\n",
+	)
+
+	resolved = [event.data for event in events if event.type == EventType.PLAYER_RESOLVED]
+	assert resolved == [PlayerReference(name="Foo#1234", entity_id=2, player_id=1)]
+	assert resolved[0] is parser.player_manager.get_player_by_player_id(1)
+
+
+def test_subscribe_types():
+	parser = LogParser()
+	events = []
+	parser.subscribe(events.append, (EventType.GAME_START, ))
+	parser.read(StringIO(data.INITIAL_GAME))
+	assert [event.type for event in events] == [EventType.GAME_START]
+
+	parser.unsubscribe(events.append)
+	parser.read(StringIO(data.INITIAL_GAME))
+	parser.flush()
+	assert len(events) == 1
@@ -1,16 +1,20 @@
+import sys
 import time
 from io import StringIO
 
+import pytest
 from hearthstone.entities import Player
-from hearthstone.enums import GameTag
+from hearthstone.enums import BlockType, GameTag, Zone
 
+from hslog import LogParser
 from hslog.export import (
-	BaseExporter, CompositeExporter, EntityTreeExporter, FriendlyPlayerExporter
+	BaseExporter, CompositeExporter, EntityTreeExporter,
+	FriendlyPlayerExporter, TagHistoryExporter
 )
-from hslog.packets import Block, SubSpell
+from hslog.packets import Block, PacketTree, SubSpell, TagChange
 
 from . import data
-from .conftest import logfile
+from .conftest import logfile, parse
 
 
 class LoggingExporter(BaseExporter):
@@ -322,6 +326,238 @@ class TestCompositeExporter:
 		assert exporter1.handle_vo_spell_calls == 1
 		assert exporter2.handle_vo_spell_calls == 1
 
+	def test_export(self):
+		packet_tree = nested_blocks(3)
+		recorder = TagChangeRecorder(packet_tree)
+		logging_exporter = LoggingExporter(packet_tree)
+		composite_exporter = CompositeExporter(
+			packet_tree, [recorder, BaseExporter(packet_tree), logging_exporter]
+		).export()
+
+		assert recorder.tag_changes == TagChangeRecorder(packet_tree).export().tag_changes
+		assert logging_exporter.handle_tag_change_calls == 6
+		assert logging_exporter.handle_block_calls == 3
+		assert logging_exporter.handle_sub_spell_calls == 3
+		assert logging_exporter.flush_calls == 1
+
+		# Only the children which implement a handler are called
+		base_exporter = composite_exporter.exporters[1]
+		assert composite_exporter._fan_out[(recorder, base_exporter)][TagChange] == (
+			[recorder.handle_tag_change], None
+		)
+		handlers, (exporters, _) = composite_exporter._fan_out[
+			(recorder, base_exporter, logging_exporter)
+		][Block]
+		assert handlers == [logging_exporter.handle_block]
+		assert exporters == (recorder, base_exporter)
+
+	def test_export_entity_tree(self):
+		parser = LogParser()
+		parser.read(StringIO(data.INITIAL_GAME))
+		parser.read(StringIO(data.FULL_ENTITY))
+		parser.read(StringIO(data.CONTROLLER_CHANGE))
+		parser.read(StringIO(data.SUB_SPELL_BLOCK))
+		parser.flush()
+		packet_tree = parser.games[0]
+
+		expected = EntityTreeExporter(packet_tree, tolerate_missing_entities=True).export().game
+		exporter = EntityTreeExporter(packet_tree, tolerate_missing_entities=True)
+		CompositeExporter(packet_tree, [exporter, LoggingExporter(packet_tree)]).export()
+		assert [(e.id, e.tags) for e in exporter.game.entities] == [
+			(e.id, e.tags) for e in expected.entities
+		]
+
+
+class TestEntityTreeExporterSnapshots:
+	def _parse(self, log):
+		return parse(log).games[0]
+
+	@pytest.mark.parametrize("options", [
+		{},
+		{"snapshot_interval": 4},
+		{"snapshot_turns": True},
+		{"snapshot_interval": 1, "snapshot_budget": 20000},
+	])
+	def test_state_at(self, options):
+		log = turns_log(6)
+		exporter = EntityTreeExporter(self._parse(log), **options).export()
+		final_tags = entity_tags(exporter.game)
+
+		lines = log.splitlines()
+		for count in range(2, len(lines) + 1):
+			next_line = lines[count] if count < len(lines) else ""
+			if "tag=" in next_line and "TAG_CHANGE" not in next_line:
+				# The packet of the last line isn't complete
+				continue
+			packet_tree = self._parse("\n".join(lines[:count]))
+			expected = EntityTreeExporter(packet_tree).export().game
+			game = exporter.state_at(packet_tree.packet_counter)
+			assert entity_tags(game) == entity_tags(expected)
+			assert game.players == [
+				game.find_entity_by_id(player.id) for player in expected.players
+			]
+			assert all(entity.game is game for entity in game.entities)
+
+		assert entity_tags(exporter.game) == final_tags
+
+	def test_snapshots(self):
+		packet_tree = self._parse(turns_log(6))
+
+		exporter = EntityTreeExporter(packet_tree, snapshot_turns=True).export()
+		assert len(exporter.snapshots) == 6
+		assert [snapshot.index for snapshot in exporter.snapshots] == list(range(3, 15, 2))
+
+		exporter = EntityTreeExporter(packet_tree, snapshot_interval=4).export()
+		ids = [snapshot.packet_id for snapshot in exporter.snapshots]
+		assert all(b - a >= 4 for a, b in zip(ids, ids[1:]))
+
+	def test_state_at_subclass_state(self):
+		class RecordingExporter(EntityTreeExporter):
+			def __init__(self, packet_tree, **kwargs):
+				super().__init__(packet_tree, **kwargs)
+				self.tag_changes = []
+
+			def handle_tag_change(self, packet):
+				self.tag_changes.append(packet.packet_id)
+				return super().handle_tag_change(packet)
+
+		exporter = RecordingExporter(self._parse(turns_log(6))).export()
+		tag_changes = list(exporter.tag_changes)
+		assert tag_changes
+
+		assert exporter.state_at(tag_changes[-1]) is not exporter.game
+		assert exporter.tag_changes == tag_changes
+
+	def test_state_at_replay_exporter(self):
+		class TagFilterExporter(EntityTreeExporter):
+			def __init__(self, packet_tree, ignored_tag):
+				super().__init__(packet_tree)
+				self.ignored_tag = ignored_tag
+
+			def handle_tag_change(self, packet):
+				if packet.tag != self.ignored_tag:
+					return super().handle_tag_change(packet)
+
+			def _replay_exporter(self):
+				return type(self)(self.packet_tree, self.ignored_tag)
+
+		packet_tree = self._parse(turns_log(6))
+		exporter = TagFilterExporter(packet_tree, GameTag.RESOURCES).export()
+		game = exporter.state_at(packet_tree.packet_counter)
+		assert entity_tags(game) == entity_tags(exporter.game)
+		assert GameTag.RESOURCES not in game.find_entity_by_id(3).tags
+
+	def test_snapshot_budget(self):
+		packet_tree = self._parse(turns_log(6))
+		exporter = EntityTreeExporter(packet_tree, snapshot_interval=1).export()
+		size = sum(snapshot.size for snapshot in exporter.snapshots)
+
+		budget = size // 3
+		exporter = EntityTreeExporter(
+			packet_tree, snapshot_interval=1, snapshot_budget=budget
+		).export()
+		assert 1 < len(exporter.snapshots) <= 4
+		assert sum(snapshot.size for snapshot in exporter.snapshots) <= budget
+
+		exporter = EntityTreeExporter(
+			packet_tree, snapshot_interval=1, snapshot_budget=1
+		).export()
+		assert exporter.snapshots == []
+		assert entity_tags(exporter.state_at(10)) == entity_tags(
+			EntityTreeExporter(packet_tree).state_at(10)
+		)
+
+
+class TestStopConditions:
+	def _parse(self):
+		return parse(turns_log(4)).games[0]
+
+	def test_until_packet_id(self):
+		packet_tree = self._parse()
+		tag_changes = list(packet_tree.recursive_iter(TagChange))
+		for tag_change in tag_changes:
+			packet_id = tag_change.packet_id
+			exporter = TagChangeRecorder(packet_tree).export(until_packet_id=packet_id)
+			assert exporter.stopped == (tag_change is not tag_changes[-1])
+			assert exporter.tag_changes == [
+				packet.value for packet in tag_changes if packet.packet_id <= packet_id
+			]
+
+	def test_until_turn(self):
+		packet_tree = self._parse()
+		game = EntityTreeExporter(packet_tree).export(until_turn=2).game
+		assert game.tags[GameTag.TURN] == 2
+
+		turn_change, = [
+			packet for packet in packet_tree.recursive_iter(TagChange)
+			if packet.tag == GameTag.TURN and packet.value == 3
+		]
+		assert entity_tags(game) == entity_tags(
+			EntityTreeExporter(packet_tree).state_at(turn_change.packet_id - 1)
+		)
+
+	def test_until(self):
+		packet_tree = self._parse()
+		exporter = LoggingExporter(packet_tree)
+		exporter.export(until=lambda packet: exporter.handle_tag_change_calls == 5)
+
+		assert exporter.stopped
+		assert exporter.handle_tag_change_calls == 5
+		assert exporter.flush_calls == 1
+
+		recorder = TagChangeRecorder(packet_tree)
+		composite = CompositeExporter(packet_tree, [recorder]).export(
+			until=lambda packet: isinstance(packet, TagChange) and packet.value == 2
+		)
+		assert composite.stopped
+		assert recorder.tag_changes == [1, 1, 1, 2]
+
+		composite.set_stop_condition()
+		assert not composite.stopped
+
+
+class TestTagHistoryExporter:
+	def test_value_at(self):
+		parser = LogParser()
+		parser.read(StringIO(turns_log(4)))
+		parser.flush()
+		packet_tree = parser.games[0]
+		exporter = TagHistoryExporter(packet_tree).export()
+		entity_tree = EntityTreeExporter(packet_tree)
+
+		for packet_id in range(1, packet_tree.packet_counter + 1):
+			game = entity_tree.state_at(packet_id)
+			for entity in game.entities:
+				for tag in set(entity.tags) | set(exporter.histories[entity.id]):
+					assert exporter.value_at(entity.id, tag, packet_id, 0) == (
+						entity.tags.get(tag, 0)
+					)
+
+		assert exporter.value_at(4, GameTag.ZONE_POSITION, 0) is None
+		assert exporter.value_at(999, GameTag.ZONE, 1000, 0) == 0
+		assert [value for _, value in exporter.history(4, GameTag.ZONE_POSITION)] == [
+			1, 2, 3, 4
+		]
+
+	def test_full_entity_update(self):
+		parser = LogParser()
+		parser.read(StringIO(data.INITIAL_GAME + "\n" + data.FULL_ENTITY))
+		parser.read(StringIO(
+			"D 22:25:49.0000000 GameState.DebugPrintPower() - FULL_ENTITY - Updating "
+			"[entityName=UNKNOWN ENTITY [cardType=INVALID] id=4 zone=DECK zonePos=0 cardId= "
+			"player=1] CardID=\n"
+			"D 22:25:49.0000000 GameState.DebugPrintPower() -     tag=ZONE value=HAND\n"
+		))
+		parser.flush()
+		packet_tree = parser.games[0]
+		exporter = TagHistoryExporter(packet_tree).export()
+
+		packet_id = packet_tree.packet_counter
+		assert exporter.value_at(4, GameTag.ZONE, packet_id) == Zone.HAND
+		assert exporter.value_at(4, GameTag.ZONE, packet_id - 1) == Zone.DECK
+		assert exporter.value_at(4, GameTag.CONTROLLER, packet_id) == 0
+		assert exporter.value_at(4, GameTag.CONTROLLER, packet_id - 1) == 1
+
 
 class TestFriendlyPlayerExporter:
 	def test_inferrable(self, parser):
@@ -381,3 +617,94 @@ class TestEntityTreeExporter:
 		entity = exporter.game.find_entity_by_id(2)
 		assert isinstance(entity, Player)
 		assert entity.tags[GameTag.PLAYER_ID] == 1
+
+
+def turns_log(turns):
+	lines = []
+	for turn in range(1, turns + 1):
+		ts = "D 22:26:%02d.0000000 GameState.DebugPrintPower() - " % turn
+		lines += [
+			ts + "BLOCK_START BlockType=TRIGGER Entity=1 EffectCardId= EffectIndex=-1 "
+			"Target=0 SubOption=-1",
+			ts + "    TAG_CHANGE Entity=1 tag=TURN value=%i" % turn,
+			ts + "    BLOCK_START BlockType=POWER Entity=4 EffectCardId= EffectIndex=-1 "
+			"Target=0 SubOption=-1",
+			ts + "        TAG_CHANGE Entity=4 tag=ZONE_POSITION value=%i" % turn,
+			ts + "        TAG_CHANGE Entity=2 tag=NUM_CARDS_DRAWN_THIS_TURN value=%i" % turn,
+			ts + "    BLOCK_END",
+			ts + "    TAG_CHANGE Entity=4 tag=CONTROLLER value=%i" % (turn % 2 + 1),
+			ts + "BLOCK_END",
+			ts + "TAG_CHANGE Entity=3 tag=RESOURCES value=%i" % turn,
+		]
+	return "\n".join((data.INITIAL_GAME, data.FULL_ENTITY, "\n".join(lines))) + "\n"
+
+
+def entity_tags(game):
+	return [(entity.id, entity.tags) for entity in game.entities]
+
+
+class TagChangeRecorder(BaseExporter):
+	def __init__(self, packet_tree):
+		super().__init__(packet_tree)
+		self.tag_changes = []
+
+	def handle_tag_change(self, packet):
+		self.tag_changes.append(packet.value)
+
+
+def nested_blocks(depth):
+	packet_tree = PacketTree(None)
+	node = packet_tree
+	for i in range(depth):
+		block = Block(None, 1, BlockType.TRIGGER, 0, 0, 0, 0, 0, 0)
+		sub_spell = SubSpell(None, "", 0, 0)
+		block.packets.append(TagChange(None, 1, GameTag.ZONE, i, False))
+		block.packets.append(sub_spell)
+		block.packets.append(TagChange(None, 1, GameTag.ZONE, -i, False))
+		node.packets.append(block)
+		node = sub_spell
+	return packet_tree
+
+
+class TestBaseExporter:
+	def test_export_nested_blocks(self):
+		depth = sys.getrecursionlimit() * 2
+		exporter = TagChangeRecorder(nested_blocks(depth)).export()
+
+		assert exporter.tag_changes == list(range(depth)) + [-i for i in reversed(range(depth))]
+
+	def test_export_packet_subclass(self):
+		class CustomTagChange(TagChange):
+			__slots__ = ()
+
+		packet_tree = PacketTree(None)
+		packet_tree.packets.append(CustomTagChange(None, 1, GameTag.ZONE, 1, False))
+		assert TagChangeRecorder(packet_tree).export().tag_changes == [1]
+
+	def test_export_skips_no_op_handlers(self):
+		exporter = TagChangeRecorder(nested_blocks(1)).export()
+
+		assert exporter._handlers[TagChange] == (exporter.handle_tag_change, False)
+		assert exporter._handlers[Block] == (None, True)
+		assert exporter._handlers[SubSpell] == (None, True)
+
+	def test_export_packet_override(self):
+		exported = []
+
+		class Exporter(TagChangeRecorder):
+			def export_packet(self, packet):
+				exported.append(type(packet))
+				super().export_packet(packet)
+
+		exporter = Exporter(nested_blocks(3)).export()
+
+		assert exporter.tag_changes == [0, 1, 2, -2, -1, 0]
+		assert exported.count(TagChange) == 6
+		assert exported.count(SubSpell) == 3
+
+	def test_overridden_block_handlers(self):
+		exporter = LoggingExporter(nested_blocks(3)).export()
+
+		assert exporter.handle_tag_change_calls == 6
+		assert exporter.handle_block_calls == 3
+		assert exporter.handle_sub_spell_calls == 3
@@ -0,0 +1,112 @@
+import asyncio
+import os
+
+from hslog import LogParser, packets
+from hslog.events import EventType
+from hslog.live import follow
+
+from . import conftest, data
+from .conftest import packet_signature
+
+
+LOG = (data.MIXED_GAME + "\n").encode("utf-8")
+
+
+def parse(log):
+	"""Return a parser for \a log and the packets in the order they were added."""
+	parser = LogParser()
+	added = []
+	parser.subscribe(lambda event: added.append(event.data), (EventType.PACKET, ))
+	return conftest.parse(log.decode("utf-8"), parser=parser), added
+
+
+async def take(agen, count):
+	return [await asyncio.wait_for(agen.__anext__(), 5) for _ in range(count)]
+
+
+def test_follow(tmp_path):
+	path = tmp_path / "Power.log"
+	split = LOG.index(b"\n", len(LOG) // 2) + 1
+	# Start in the middle of a line: only complete lines are parsed
+	path.write_bytes(LOG[:split + 10])
+
+	expected, added = parse(LOG)
+	count = len(added)
+	first_half = len(parse(LOG[:split])[1])
+
+	async def run():
+		parser = LogParser()
+		agen = follow(str(path), parser=parser, poll_interval=0.01, chunk_size=100)
+		ret = await take(agen, first_half)
+
+		with open(path, "ab") as f:
+			f.write(LOG[split + 10:])
+		ret += await take(agen, count - first_half)
+
+		# Hearthstone restarted: the log is replaced with a new file
+		new_path = tmp_path / "Power.log.new"
+		new_path.write_bytes(data.INITIAL_GAME.encode("utf-8") + b"\n")
+		os.replace(str(new_path), str(path))
+		ret += await take(agen, 1)
+		assert 0 < parser.offset <= len(data.INITIAL_GAME) + 1
+		await agen.aclose()
+		assert parser._parsing_state.subscribers == {}
+		return parser, ret
+
+	parser, ret = asyncio.run(run())
+	assert len(parser.games) == 2
+	assert packet_signature(parser.games[0]) == packet_signature(expected.games[0])
+
+	def ids(packets):
+		return [(type(packet), getattr(packet, "packet_id", None)) for packet in packets]
+
+	assert ids(ret[:count]) == ids(added)
+	assert isinstance(ret[-1], packets.CreateGame)
+	assert ret[-1] is parser.games[1].packets[0]
+
+
+def test_follow_missing_file(tmp_path):
+	path = tmp_path / "Power.log"
+
+	async def run():
+		agen = follow(str(path), poll_interval=0.01)
+		task = asyncio.ensure_future(take(agen, 1))
+		await asyncio.sleep(0.05)
+		assert not task.done()
+		path.write_bytes(data.INITIAL_GAME.encode("utf-8") + b"\n")
+		ret = await task
+		await agen.aclose()
+		return ret
+
+	packet, = asyncio.run(run())
+	assert isinstance(packet, packets.CreateGame)
+
+
+def test_follow_truncated(tmp_path):
+	path = tmp_path / "Power.log"
+	path.write_bytes(LOG)
+
+	async def run():
+		parser = LogParser()
+		agen = follow(str(path), parser=parser, poll_interval=0.01, chunk_size=1000)
+		await take(agen, 1)
+		path.write_bytes(b"")
+
+		async def next_game():
+			# Packets already parsed from the old file come first
+			while True:
+				packet, = await take(agen, 1)
+				if isinstance(packet, packets.CreateGame):
+					return packet
+
+		task = asyncio.ensure_future(next_game())
+		await asyncio.sleep(0.05)
+		with open(path, "ab") as f:
+			f.write(data.INITIAL_GAME.encode("utf-8") + b"\n")
+		ret = await task
+		await agen.aclose()
+		return parser, ret
+
+	parser, packet = asyncio.run(run())
+	assert len(parser.games) == 2
+	assert packet is parser.games[1].packets[0]
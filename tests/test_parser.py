@@ -1,5 +1,7 @@
+import pickle
+import re
 from datetime import datetime, time, timedelta
-from io import StringIO
+from io import BytesIO, StringIO
 from unittest.mock import patch
 
 import pytest
@@ -8,12 +10,14 @@ from hearthstone.enums import (
 	CardType, ChoiceType, GameTag, OptionType, PlayState, PowerType, State, Step, Zone
 )
 
-from hslog import LogParser, packets
-from hslog.exceptions import CorruptLogError, ParsingError
+from hslog import LogParser, codec, packets
+from hslog.exceptions import CorruptLogError, NoSuchEnum, ParsingError
 from hslog.packets import TagChange
-from hslog.parser import parse_initial_tag
+from hslog.parser import HandlerBase, parse_initial_tag
+from hslog.utils import parse_powerlog_time
 
 from . import data
+from .conftest import packet_signature, packet_signature_of, parse
 
 
 class TestLogParser:
@@ -167,7 +171,7 @@ class TestLogParser:
 
 		parser.read(StringIO(data.INITIAL_GAME))
 
-		with patch("hslog.parser.parse_time", wraps=parse_time) as spy:
+		with patch("hslog.parser.parse_powerlog_time", wraps=parse_powerlog_time) as spy:
 			parser.read(StringIO(data.REPEATED_TIMESTAMP))
 		spy.assert_called_once()  # The same repeated timestamp should only be parsed once
 
@@ -184,6 +188,74 @@ class TestLogParser:
 		# Timestamp has to be truncated
 		assert parser.games[0].packets[1].ts == time(14, 43, 59, 999999)
 
+	@pytest.mark.parametrize("ts", [
+		"02:59:14.6088620",
+		"14:43:59.9999999",
+		"00:00:00.0000000",
+		"23:59:59.123",
+		"23:59:59.1234567890",
+		"02:59:14",
+	])
+	def test_powerlog_time_matches_aniso8601(self, ts):
+		assert parse_powerlog_time(ts) == parse_time(ts)
+
+	def test_tag_cache(self):
+		parser = LogParser()
+		parser.read(StringIO(data.INITIAL_GAME))
+		parser.flush()
+
+		info = parser.tag_cache_info()
+		assert info.misses == info.currsize
+		assert info.hits > 0
+
+		# Cached results are shared, errors are raised every time
+		ps = parser._parsing_state
+		assert ps.parse_tag("ZONE", "PLAY") == (GameTag.ZONE, Zone.PLAY)
+		assert parser.tag_cache_info().hits == info.hits + 1
+		for _ in range(2):
+			with pytest.raises(NoSuchEnum):
+				ps.parse_tag("EOE", "1")
+
+	def test_entity_cache(self):
+		parser = LogParser()
+		parser.read(StringIO(data.INITIAL_GAME))
+		ps = parser._parsing_state
+
+		entity = "[entityName=Fireball id=57 zone=HAND zonePos=3 cardId=CS2_029 player=1]"
+		assert ps.parse_entity_id(entity) == 57
+		assert ps._entity_id_cache[entity] == 57
+		assert ps.parse_entity_id(entity) == 57
+
+		# Players are only cached once fully resolved
+		player = ps.parse_entity_or_player("Alice")
+		assert player.entity_id is None
+		assert "Alice" not in ps._player_cache
+
+		ps.manager.create_or_update_player(name="Alice", player_id=1)
+		assert ps.parse_entity_or_player("Alice") is player
+		assert player.entity_id == 2
+		assert ps._player_cache["Alice"] is player
+
+		# Caches are per game
+		parser.read(StringIO(data.INITIAL_GAME))
+		assert not ps._entity_id_cache
+		assert not ps._player_cache
+
+	def test_pickle_packet_tree(self):
+		parser = LogParser()
+		parser.read(StringIO(data.INITIAL_GAME))
+		parser.read(StringIO(data.SUB_SPELL_BLOCK))
+		parser.flush()
+
+		packet_tree = parser.games[0]
+		assert not any(hasattr(packet, "__dict__") for packet in packet_tree.recursive_iter())
+
+		restored = pickle.loads(pickle.dumps(packet_tree))
+		assert packet_signature(restored) == packet_signature(packet_tree)
+		assert restored.spectator_mode == packet_tree.spectator_mode
+		block = restored.packets[-1]
+		assert block.packets[0].parent is block
+
 	def test_info_outside_of_metadata(self):
 		parser = LogParser()
 		parser.read(StringIO(data.INITIAL_GAME))
@@ -609,3 +681,299 @@ class TestLogParser:
 		packet_tree = parser.games[0]
 		tag_changes = [p for p in packet_tree.packets[1] if isinstance(p, TagChange)]
 		assert len(tag_changes) == 6
+
+	def test_register_handler(self):
+		class FooHandler(HandlerBase):
+			callbacks = {"DebugPrintFoo": "handle_foo"}
+
+			def __init__(self):
+				super().__init__()
+				self.lines = []
+
+			def handle_foo(self, ps, ts, data):
+				self.lines.append(data)
+
+		parser = LogParser()
+		handler = FooHandler()
+		parser.register_handler(handler)
+		parser.read(StringIO(data.INITIAL_GAME))
+		parser.read(StringIO("D 02:59:14.6500380 GameState.DebugPrintFoo() - bar=1"))
+		parser.flush()
+
+		assert handler.lines == ["bar=1"]
+		assert len(parser.games) == 1
+
+
+class TestReadBytes:
+	def test_read_bytes(self):
+		parser = parse(data.MIXED_GAME)
+
+		bytes_parser = LogParser()
+		bytes_parser.read_bytes(BytesIO(data.MIXED_GAME.encode("utf-8")))
+		bytes_parser.flush()
+
+		assert len(bytes_parser.games) == 1
+		assert packet_signature(bytes_parser.games[0]) == packet_signature(parser.games[0])
+
+	def test_read_bytes_line_regex(self):
+		line_regex = re.compile(r"(GameState\.DebugPrintPower)\(\) - (.+)$")
+
+		parser = LogParser()
+		parser.line_regex = line_regex
+		parse(data.MIXED_GAME, parser=parser)
+
+		bytes_parser = LogParser()
+		bytes_parser.line_regex = line_regex
+		bytes_parser.read_bytes(BytesIO(data.MIXED_GAME.encode("utf-8")))
+		bytes_parser.flush()
+
+		packet_tree = bytes_parser.games[0]
+		assert not packet_tree.packets_of(packets.Options)
+		assert packet_signature(packet_tree) == packet_signature(parser.games[0])
+
+	def test_read_bytes_crlf(self):
+		parser = LogParser()
+		parser.read_bytes(BytesIO(data.MIXED_GAME.replace("\n", "\r\n").encode("utf-8")))
+		parser.flush()
+
+		options_packet = parser.games[0].packets[3]
+		assert isinstance(options_packet, packets.Options)
+		assert options_packet.options[0].error == "INVALID"
+
+	def test_read_bytes_spectator_mode(self):
+		parser = LogParser()
+		parser.read_bytes(BytesIO(
+			b"D 02:59:14.6000000 ================== Start Spectator Game ==================\n" +
+			data.EMPTY_GAME.encode("utf-8")
+		))
+
+		assert parser.games[0].spectator_mode
+
+	def test_read_bytes_invalid_utf8(self):
+		parser = LogParser()
+		parser.read_bytes(BytesIO(data.INITIAL_GAME.encode("utf-8")))
+
+		# Lines that aren't handled are never decoded
+		parser.read_line_bytes(
+			b"D 02:59:14.6500380 PowerTaskList.DebugPrintPower() - TAG_CHANGE Entity=\xff\n"
+		)
+
+		with pytest.raises(CorruptLogError):
+			parser.read_line_bytes(
+				b"D 02:59:14.6500380 GameState.DebugPrintPower() - TAG_CHANGE Entity=\xff\n"
+			)
+
+
+class TestReadPath:
+	def test_read_path(self, tmp_path):
+		path = tmp_path / "Power.log"
+		path.write_bytes(data.MIXED_GAME.encode("utf-8") + b"\n")
+
+		parser = parse(data.MIXED_GAME)
+
+		mmap_parser = LogParser()
+		mmap_parser.read_path(str(path))
+		mmap_parser.flush()
+
+		assert packet_signature(mmap_parser.games[0]) == packet_signature(parser.games[0])
+
+	def test_read_path_no_trailing_newline(self, tmp_path):
+		path = tmp_path / "Power.log"
+		path.write_bytes(data.MIXED_GAME.encode("utf-8"))
+
+		parser = LogParser()
+		parser.read_path(str(path))
+		assert parser.offset == len(data.MIXED_GAME.encode("utf-8"))
+		parser.flush()
+
+		expected = parse(data.MIXED_GAME).games[0]
+		assert list(parser.games[0].recursive_iter(packets.ShuffleDeck))
+		assert packet_signature(parser.games[0]) == packet_signature(expected)
+
+	def test_read_path_empty_file(self, tmp_path):
+		path = tmp_path / "Power.log"
+		path.write_bytes(b"")
+
+		parser = LogParser()
+		parser.read_path(str(path))
+		assert parser.games == []
+
+
+class TestCheckpoint:
+	def test_checkpoint(self, tmp_path):
+		content = (data.MIXED_GAME + "\n").encode("utf-8")
+		path = tmp_path / "Power.log"
+		path.write_bytes(content)
+
+		parser = LogParser()
+		parser.read_path(str(path))
+		parser.flush()
+		expected = packet_signature(parser.games[0])
+
+		# Resuming at any line boundary gives the same result as a single pass
+		boundaries = [i + 1 for i, c in enumerate(content) if c == ord("\n")]
+		for boundary in boundaries[::3]:
+			parser = LogParser()
+			parser.read_path(str(path), end=boundary)
+			assert parser.offset == boundary
+
+			resumed = LogParser.from_checkpoint(parser.checkpoint())
+			assert resumed.offset == boundary
+			resumed.read_path(str(path), start=resumed.offset)
+			assert resumed.offset == len(content)
+			resumed.flush()
+
+			assert packet_signature(resumed.games[0]) == expected
+
+	def test_checkpoint_partial_line(self, tmp_path):
+		content = (data.MIXED_GAME + "\n").encode("utf-8")
+		expected = packet_signature(parse(data.MIXED_GAME).games[0])
+
+		# The log is cut in the middle of a line while it is being written
+		cut = content.index(b"tag=", len(content) // 2)
+		line_start = content.rindex(b"\n", 0, cut) + 1
+		path = tmp_path / "Power.log"
+		path.write_bytes(content[:cut])
+
+		parser = LogParser()
+		parser.read_path(str(path), complete_lines=True)
+		assert parser.offset == line_start
+
+		resumed = LogParser.from_checkpoint(parser.checkpoint())
+		with open(path, "ab") as f:
+			f.write(content[cut:])
+		resumed.read_path(str(path), start=resumed.offset, complete_lines=True)
+		assert resumed.offset == len(content)
+		resumed.flush()
+
+		assert packet_signature(resumed.games[0]) == expected
+
+	def test_checkpoint_open_block(self):
+		parser = LogParser()
+		parser.read(StringIO(data.INITIAL_GAME))
+		parser.read(StringIO("\n".join(data.SUB_SPELL_BLOCK.splitlines()[:-2])))
+
+		resumed = LogParser.from_checkpoint(parser.checkpoint())
+		ps = resumed._parsing_state
+		assert isinstance(ps.current_block, packets.SubSpell)
+		assert ps.current_block.parent.parent.parent is ps.packet_tree
+		assert resumed._callbacks["GameState.DebugPrintPower"].__self__ is (
+			resumed._power_handler
+		)
+
+	def test_checkpoint_invalid(self):
+		with pytest.raises(TypeError):
+			LogParser.from_checkpoint(pickle.dumps(None))
+
+
+class TestColumnar:
+	def _parse(self, columnar, current_date=None):
+		return parse(
+			data.MIXED_GAME, data.CONTROLLER_CHANGE, columnar=columnar, current_date=current_date
+		)
+
+	@pytest.mark.parametrize("current_date", [
+		None, parse_datetime("2015-01-01T02:58:00+0200")
+	])
+	def test_columnar(self, current_date):
+		parser = self._parse(False, current_date)
+		columnar_parser = self._parse(True, current_date)
+
+		packet_tree = columnar_parser.games[0]
+		assert packet_tree.columnar
+		assert len(packet_tree.tag_changes) > 0
+		assert packet_signature(packet_tree) == packet_signature(parser.games[0])
+
+		def types(packet_tree):
+			return [
+				(type(packet.ts), type(packet.entity), type(packet.tag), type(packet.value))
+				for packet in packet_tree.recursive_iter(TagChange)
+			]
+
+		assert types(packet_tree) == types(parser.games[0])
+
+	def test_columnar_export(self):
+		games = []
+		for columnar in (False, True):
+			parser = LogParser(columnar=columnar)
+			parser.read(StringIO(data.INITIAL_GAME))
+			parser.read(StringIO(data.FULL_ENTITY))
+			parser.read(StringIO(data.CONTROLLER_CHANGE))
+			parser.flush()
+			games.append(parser.games[0].export().game)
+
+		game, columnar_game = games
+		assert [(e.id, e.tags) for e in columnar_game.entities] == [
+			(e.id, e.tags) for e in game.entities
+		]
+
+	def test_packet_list(self):
+		packet_tree = self._parse(True).games[0]
+		packets = list(packet_tree.packets)
+		assert any(isinstance(packet, TagChange) for packet in packets)
+
+		def ids(packets):
+			return [getattr(packet, "packet_id", None) for packet in packets]
+
+		assert len(packet_tree.packets) == len(packets)
+		assert ids(packet_tree.packets[1:3]) == ids(packets[1:3])
+		assert ids([packet_tree.packets[-1]]) == ids(packets[-1:])
+		assert ids(reversed(packet_tree.packets)) == ids(reversed(packets))
+		assert packet_tree.end_time == packets[-1].ts
+
+		restored = pickle.loads(pickle.dumps(packet_tree))
+		assert packet_signature(restored) == packet_signature(packet_tree)
+
+
+class TestPacketIndex:
+	def _parse(self, columnar=False):
+		return parse(data.MIXED_GAME, columnar=columnar, index=True).games[0]
+
+	@pytest.mark.parametrize("columnar", [False, True])
+	def test_packets_of(self, columnar):
+		packet_tree = self._parse(columnar)
+		assert packet_tree.packet_index is not None
+		walked = self._parse(columnar)
+		walked.packet_index = None
+
+		for cls in (
+			packets.Packet, TagChange, packets.Options, packets.Option, packets.SubSpell,
+			packets.CreateGame.Player, packets.ShuffleDeck, packets.VOSpell,
+		):
+			expected = walked.packets_of(cls)
+			assert packet_signature_of(packet_tree.packets_of(cls)) == (
+				packet_signature_of(expected)
+			)
+
+		all_packets = packet_tree.packets_of(packets.Packet)
+		assert [
+			packet.packet_id for packet in all_packets if not isinstance(packet, packets.Options)
+		] == list(range(1, packet_tree.packet_counter + 1))
+		assert packet_signature_of(packet_tree.packets_of(TagChange)) == packet_signature_of(
+			packet for packet in all_packets if isinstance(packet, TagChange)
+		)
+		# Packets nested in SubSpell blocks are included
+		sub_spell, = packet_tree.packets_of(packets.SubSpell)
+		nested = {packet.packet_id for packet in sub_spell.packets}
+		assert nested
+		assert nested <= {getattr(packet, "packet_id", None) for packet in all_packets}
+
+	def test_packets_of_returns_copy(self):
+		packet_tree = self._parse()
+		packet_tree.packets_of(packets.Options).clear()
+		assert len(packet_tree.packets_of(packets.Options)) == 1
+
+	def test_packets_of_restored(self):
+		packet_tree = self._parse()
+		expected = packet_signature_of(packet_tree.packets_of(packets.Packet))
+
+		restored = pickle.loads(pickle.dumps(packet_tree))
+		assert packet_signature_of(restored.packets_of(packets.Packet)) == expected
+		restored = codec.loads(codec.dumps(packet_tree))
+		assert restored.packet_index is None
+		assert packet_signature_of(restored.packets_of(packets.Packet)) == expected
+		restored.create_index()
+		assert packet_signature_of(restored.packets_of(packets.Packet)) == expected
+
+	def test_index_opt_in(self):
+		assert parse(data.MIXED_GAME).games[0].packet_index is None
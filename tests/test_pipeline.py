@@ -0,0 +1,128 @@
+from io import StringIO
+
+import pytest
+
+from hslog import LogParser
+from hslog.export import BaseExporter, CompositeExporter, EntityTreeExporter
+from hslog.pipeline import ExportPipeline
+
+from . import data
+
+
+LOG = "\n".join((data.INITIAL_GAME, data.FULL_ENTITY, data.CONTROLLER_CHANGE))
+PLAYER_NAMES = (
+	"D 02:59:14.6500380 GameState.DebugPrintGame() - PlayerID=1, PlayerName=Foo#1234\n"
+	"D 02:59:14.6500380 GameState.DebugPrintGame() - PlayerID=2, PlayerName=Bar#5678\n"
+)
+
+
+class PacketCounter(BaseExporter):
+	def __init__(self, packet_tree):
+		super().__init__(packet_tree)
+		self.count = 0
+		self.flushed = False
+
+	def export_packet(self, packet):
+		self.count += 1
+		super().export_packet(packet)
+
+	def flush(self):
+		self.flushed = True
+
+
+def entities(game):
+	return {entity_id: entity.tags for entity_id, entity in game._entities.items()}
+
+
+def test_pipeline():
+	parser = LogParser()
+	parser.read(StringIO(LOG))
+	parser.flush()
+	expected = EntityTreeExporter(
+		parser.games[0], player_manager=parser.player_manager
+	).export().game
+
+	parser = LogParser()
+	games = []
+	pipeline = ExportPipeline(
+		parser,
+		[EntityTreeExporter, PacketCounter],
+		on_game=lambda packet_tree, exporters: games.append(exporters),
+	)
+	parser.read(StringIO(LOG))
+	parser.flush()
+
+	assert parser.games == []
+	assert games == pipeline.results
+	(exporter, counter), = pipeline.results
+	assert entities(exporter.game) == entities(expected)
+	assert exporter.player_manager is parser.player_manager
+	assert counter.count == 3
+	assert counter.flushed
+
+
+def test_pipeline_composite():
+	parser = LogParser()
+	pipeline = ExportPipeline(parser, [
+		lambda packet_tree: CompositeExporter(packet_tree, [
+			EntityTreeExporter(packet_tree, player_manager=parser.player_manager),
+			PacketCounter(packet_tree),
+		])
+	])
+	parser.read(StringIO(LOG))
+	parser.flush()
+
+	(composite, ), = pipeline.results
+	exporter, counter = composite.exporters
+	assert sorted(entities(exporter.game)) == [1, 2, 3, 4]
+	assert counter.flushed
+
+
+def test_pipeline_defers_until_players_resolved():
+	parser = LogParser()
+	pipeline = ExportPipeline(parser, [PacketCounter])
+	parser.read(StringIO(data.INITIAL_GAME + "\n" + data.FULL_ENTITY + "\n"))
+
+	counter, = pipeline.exporters
+	assert counter.count == 0
+
+	parser.read(StringIO(PLAYER_NAMES + data.CONTROLLER_CHANGE + "\n"))
+	assert counter.count == 3
+
+	parser.read(StringIO(data.CONTROLLER_CHANGE + "\n"))
+	assert counter.count == 4
+	assert not counter.flushed
+	parser.flush()
+	assert counter.flushed
+
+
+def test_pipeline_max_deferred():
+	log = "\n".join((data.INITIAL_GAME, data.FULL_ENTITY, data.CONTROLLER_CHANGE)) + "\n"
+
+	# The players of this game are never resolved
+	parser = LogParser()
+	pipeline = ExportPipeline(parser, [PacketCounter])
+	parser.read(StringIO(log))
+	counter, = pipeline.exporters
+	assert counter.count == 0
+	parser.flush()
+	assert counter.count == 3
+
+	parser = LogParser()
+	pipeline = ExportPipeline(parser, [PacketCounter], max_deferred=2)
+	parser.read(StringIO(log))
+	counter, = pipeline.exporters
+	assert counter.count == 3
+
+
+def test_pipeline_close():
+	parser = LogParser()
+	pipeline = ExportPipeline(parser, [PacketCounter])
+	with pytest.raises(ValueError):
+		ExportPipeline(parser, [PacketCounter])
+
+	pipeline.close()
+	parser.read(StringIO(LOG))
+	parser.flush()
+	assert pipeline.results == []
+	assert len(parser.games) == 1
@@ -0,0 +1,117 @@
+from hearthstone.enums import FormatType, GameType
+
+from hslog import LogParser
+from hslog.scan import find_game_ranges, scan_metadata, scan_metadata_path
+from hslog.utils import parse_powerlog_time
+
+from . import data
+from .conftest import packet_signature, parse
+
+
+LOG = "\n".join((
+	"D 02:59:13.0000000 PowerTaskList.DebugPrintPower() - ERROR: preamble",
+	data.INITIAL_GAME,
+	data.FULL_ENTITY,
+	data.CONTROLLER_CHANGE,
+	"D 03:10:00.0000000 PowerTaskList.DebugPrintPower() - CREATE_GAME",
+	"D 03:10:00.1000000 ================== Start Spectator Game ==================",
+	"D 03:10:00.2000000 GameState.DebugPrintGame() - GameType=GT_RANKED",
+	data.INITIAL_GAME,
+	data.FULL_ENTITY,
+)) + "\n"
+GAME_META = (
+	"D 02:59:14.6500380 GameState.DebugPrintGame() - BuildNumber=22115\n"
+	"D 02:59:14.6500380 GameState.DebugPrintGame() - GameType=GT_RANKED\n"
+	"D 02:59:14.6500380 GameState.DebugPrintGame() - FormatType=FT_STANDARD\n"
+	"D 02:59:14.6500380 GameState.DebugPrintGame() - ScenarioID=2\n"
+	"D 02:59:14.6500380 GameState.DebugPrintGame() - PlayerID=1, PlayerName=Foo#1234\n"
+	"D 02:59:14.6500380 GameState.DebugPrintGame() - PlayerID=2, PlayerName=Bar#5678\n"
+)
+META_LOG = "\n".join((
+	data.INITIAL_GAME,
+	GAME_META + data.FULL_ENTITY,
+	data.CONTROLLER_CHANGE,
+	data.INITIAL_GAME,
+	GAME_META.replace("GT_RANKED", "GT_CASUAL") + data.FULL_ENTITY,
+)) + "\n"
+
+
+def test_find_game_ranges():
+	buf = LOG.encode("utf-8")
+	ranges = find_game_ranges(buf)
+
+	assert len(ranges) == 2
+	assert ranges[0][0] == 0
+	assert ranges[0][1] == ranges[1][0]
+	assert ranges[1][1] == len(buf)
+
+	second_game = buf[ranges[1][0]:ranges[1][1]]
+	assert second_game.startswith(b"D 03:10:00.0000000 PowerTaskList")
+	assert b"Start Spectator Game" in second_game
+	assert second_game.count(b"CREATE_GAME") == 2
+
+
+def test_find_game_ranges_no_game():
+	assert find_game_ranges(b"") == []
+	assert find_game_ranges(data.FULL_ENTITY.encode("utf-8")) == []
+
+
+def test_parse_game_ranges(tmp_path):
+	path = tmp_path / "Power.log"
+	path.write_bytes(LOG.encode("utf-8"))
+
+	parser = parse(LOG)
+	assert len(parser.games) == 2
+
+	with open(path, "rb") as f:
+		ranges = find_game_ranges(f.read())
+
+	for (start, end), packet_tree in zip(ranges, parser.games):
+		range_parser = LogParser()
+		range_parser.read_path(str(path), start, end)
+		range_parser.flush()
+
+		assert len(range_parser.games) == 1
+		game = range_parser.games[0]
+		assert packet_signature(game) == packet_signature(packet_tree)
+		assert game.spectator_mode == packet_tree.spectator_mode
+
+	assert parser.games[1].spectator_mode
+
+
+def test_scan_metadata(tmp_path):
+	path = tmp_path / "Power.log"
+	path.write_bytes(META_LOG.encode("utf-8"))
+	games = scan_metadata_path(str(path))
+	assert len(games) == 2
+
+	for start, end in find_game_ranges(META_LOG.encode("utf-8")):
+		parser = LogParser()
+		parser.read_path(str(path), start, end)
+		parser.flush()
+		packet_tree = parser.games[0]
+		game = games.pop(0)
+
+		assert (game.start, game.end) == (start, end)
+		assert game.game_meta == parser._parsing_state.game_meta
+		assert game.start_time == packet_tree.packets[0].ts
+		assert game.end_time == packet_tree.packets[-1].ts
+
+		create_game = packet_tree.packets[0]
+		assert [(p.player_id, p.entity_id, p.name, p.hi, p.lo) for p in game.players] == [
+			(p.player_id, p.entity.entity_id, p.entity.name, p.hi, p.lo) for p in create_game.players
+		]
+
+	assert scan_metadata(META_LOG.encode("utf-8"))[1].game_meta == {
+		"BuildNumber": 22115,
+		"GameType": GameType.GT_CASUAL,
+		"FormatType": FormatType.FT_STANDARD,
+		"ScenarioID": 2,
+	}
+
+
+def test_scan_metadata_timestamps():
+	game, = scan_metadata(data.INITIAL_GAME.encode("utf-8"))
+	assert game.start_time == parse_powerlog_time("02:59:14.6088620")
+	assert game.players[0].name is None
+	assert scan_metadata(b"") == []
@@ -0,0 +1,99 @@
+from io import StringIO
+
+import pytest
+
+from hslog import LogParser
+from hslog.export import EntityTreeExporter
+from hslog.stream import PacketStream
+
+from . import data
+from .conftest import packet_signature, parse
+
+
+def block_sizes(packet):
+	return [block_sizes(p) for p in getattr(packet, "packets", ())]
+
+
+def test_stream_packets():
+	expected = parse(data.MIXED_GAME).games[0]
+
+	parser = LogParser()
+	streamed = []
+
+	def on_packet(packet_tree, packet):
+		# Blocks are handed over complete
+		streamed.append((packet, block_sizes(packet)))
+
+	PacketStream(parser, on_packet=on_packet)
+	retained = 0
+	for line in StringIO(data.MIXED_GAME):
+		parser.read_line(line)
+		retained = max(retained, len(parser._parsing_state.packet_tree.packets))
+	parser.flush()
+
+	assert parser.games == []
+	assert retained <= 2
+	packet_tree = parser._parsing_state.packet_tree
+	assert packet_tree.packets == []
+
+	packet_tree.packets = [packet for packet, _ in streamed]
+	assert packet_signature(packet_tree) == packet_signature(expected)
+	assert [sizes for _, sizes in streamed] == [block_sizes(p) for p in expected.packets]
+
+
+def test_stream_export():
+	log = "\n".join((data.INITIAL_GAME, data.FULL_ENTITY, data.CONTROLLER_CHANGE))
+	expected = parse(log)
+	expected_game = EntityTreeExporter(
+		expected.games[0], player_manager=expected.player_manager
+	).export().game
+
+	parser = LogParser()
+	exporters = []
+
+	def on_game_start(packet_tree):
+		exporters.append(EntityTreeExporter(
+			packet_tree, player_manager=parser.player_manager
+		))
+
+	def on_game(packet_tree):
+		exporters[-1].flush()
+
+	PacketStream(
+		parser,
+		on_packet=lambda packet_tree, packet: exporters[-1].export_packet(packet),
+		on_game=on_game,
+		on_game_start=on_game_start,
+	)
+	parser.read(StringIO(log))
+	parser.flush()
+
+	game = exporters[0].game
+	assert sorted(game._entities) == sorted(expected_game._entities)
+	for entity_id, entity in game._entities.items():
+		assert entity.tags == expected_game._entities[entity_id].tags
+
+
+def test_stream_games():
+	parser = LogParser()
+	games = []
+	stream = PacketStream(parser, on_game=games.append)
+	parser.read(StringIO(data.INITIAL_GAME))
+	parser.read(StringIO(data.INITIAL_GAME))
+	assert len(games) == 1
+	parser.flush()
+
+	assert len(games) == 2
+	assert parser.games == []
+	assert all(len(packet_tree.packets) == 1 for packet_tree in games)
+
+	stream.close()
+	parser.read(StringIO(data.INITIAL_GAME))
+	parser.flush()
+	assert len(games) == 2
+	assert len(parser.games) == 1
+
+
+def test_stream_columnar():
+	with pytest.raises(ValueError):
+		PacketStream(LogParser(columnar=True), on_game=print)